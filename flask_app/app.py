@@ -4,11 +4,18 @@ from flask import Flask,render_template_string, render_template, redirect, url_f
 from flask_login import LoginManager, login_required, logout_user, login_user, current_user
 from auth import authenticate_user, register_user
 from flask_migrate import Migrate
-from models import db, User, init_db
+from models import db, read_session, User, init_db, configure_engines
 from config import Config
 from flask import jsonify
-from data_loader.data_loader import load_parquet
-from data_loader.data_processor import process_main_stock_data, process_strategy_data
+from data_loader.dataset_manager import DatasetManager
+from data_loader.data_processor import process_main_stock_data, process_strategy_data, resolve_window, get_strategy_params_hashes
+from data_loader.downsampling import bucket_edges
+from data_loader.result_cache import strategy_result_cache
+from data_loader.single_flight import SingleFlight
+from data_loader.response_encoding import (
+    available_mimetypes, encode_stock_data, JSON_MIMETYPE,
+    available_encodings, compress_body, stock_data_etag, MIN_COMPRESS_SIZE
+)
 from strategies.StrategyManager import StrategyManager
 
 # ================== 配置区域 ==================
@@ -32,15 +39,28 @@ app = Flask(__name__, template_folder=TEMPLATES_FOLDER, static_folder=STATIC_FOL
 app.config.from_object(Config)
 
 
-# Initialize database
+# Initialize database, with SQLite pragmas (WAL, ...) and a read-only session for request handlers
 db.init_app(app)
+configure_engines(app)
 
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)
 
-# Load Parquet file at app startup
+# Load Parquet file at app startup, sorted and indexed by ts_code, and reload it in the background when it changes
+# (or when the partitioned store next to it gets seeded, see resolve_market_data_path)
 parquet_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'merged_data.parquet'))
-df = load_parquet(parquet_file_path)
+dataset_manager = DatasetManager(
+    parquet_file_path,
+    poll_interval=Config.DATASET_POLL_SECONDS,
+    price_dtype=Config.PRICE_DTYPE
+)
+dataset_manager.start()
+
+# Strategy outputs are cached in memory per dataset version, shared by all requests of this process
+strategy_result_cache.configure(Config.RESULT_CACHE_MAX_BYTES)
+
+# Concurrent identical /stock_data requests (same ETag) wait for one computation of the response body
+stock_data_flight = SingleFlight()
 
 # Initialize LoginManager
 login_manager = LoginManager()
@@ -50,7 +70,7 @@ login_manager.login_view = 'login'
 # User loader callback
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return read_session.get(User, int(user_id))
 
 @app.before_first_request
 def create_tables():
@@ -136,6 +156,7 @@ def stock_data():
         ts_code = request_data.get('ts_code')
         strategies = request_data.get('strategies', [])
     else:
+        request_data = request.args
         ts_code = request.args.get('ts_code')
         strategies = []
 
@@ -146,23 +167,80 @@ def stock_data():
     if not ts_code:
         return jsonify({'error': 'Missing ts_code'}), 400
     
-    stock_data = df[df['ts_code'] == ts_code]
+    # Keep one dataset version for the whole request, even if a reload swaps in a new one
+    dataset = dataset_manager.get()
+    stock_data = dataset.get(ts_code)
     if stock_data.empty:
         return jsonify({'error': 'No data found'}), 404
 
-    # Process main stock data
-    main_data = process_main_stock_data(stock_data)
+    # Optional view window: start/end dates and/or the last N bars, and a point budget for the chart
+    try:
+        last_n = request_data.get('last_n')
+        window = resolve_window(
+            stock_data['date'],
+            start=request_data.get('start'),
+            end=request_data.get('end'),
+            last_n=int(last_n) if last_n is not None else None
+        )
+        max_points = int(request_data['max_points']) if request_data.get('max_points') is not None else None
+        edges = bucket_edges(window[1] - window[0], max_points) if max_points is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid window: {e}'}), 400
+
+    # Encode as JSON by default, or as Arrow IPC / msgpack when the client asks for it in Accept,
+    # and compress with brotli or gzip when the client accepts it
+    mimetype = request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
+    encoding = request.accept_encodings.best_match(available_encodings())
 
-    # Process strategies
-    strategy_results = process_strategy_data(stock_data, strategies)
+    # The response only depends on the dataset version, the stock, the strategy params and the view options,
+    # so a client that already has it gets a 304 before anything is computed
+    etag = stock_data_etag(
+        dataset.version, ts_code, get_strategy_params_hashes(strategies),
+        window=window, max_points=max_points, mimetype=mimetype, encoding=encoding
+    )
+    if request.if_none_match.contains(etag):
+        not_modified = app.response_class(status=304)
+        return _set_cache_headers(not_modified, etag)
 
-    # Combine results
-    response = {
-        'main': main_data,
-        'strategies': strategy_results
-    }
+    def build_body():
+        # Process main stock data
+        main_data = process_main_stock_data(stock_data.iloc[window[0]:window[1]], edges)
+
+        # Process strategies over the window plus each strategy's warm-up, downsampled on the same buckets
+        strategy_results = process_strategy_data(
+            stock_data, strategies, dataset.get_input(ts_code), window, edges, data_version=dataset.version
+        )
 
-    return jsonify(response)
+        # Combine results
+        response = {
+            'main': main_data,
+            'strategies': strategy_results
+        }
+
+        body = encode_stock_data(response, mimetype)
+        if encoding and len(body) >= MIN_COMPRESS_SIZE:
+            return compress_body(body, encoding), encoding
+        return body, None
+
+    # The ETag identifies the body, so concurrent requests with the same ETag share one computation
+    body, content_encoding = stock_data_flight.do(etag, build_body)
+    encoded = app.response_class(body, mimetype=mimetype)
+    encoded.content_encoding = content_encoding
+    return _set_cache_headers(encoded, etag)
+
+def _set_cache_headers(response, etag: str):
+    """Let the browser keep /stock_data responses but revalidate them with If-None-Match on every use."""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    return response
+
+@app.route('/cache_stats')
+@login_required
+def cache_stats():
+    """Hit/miss/coalesced counters and size of the strategy result cache, and coalesced /stock_data requests."""
+    return jsonify(dict(strategy_result_cache.stats(), coalesced_requests=stock_data_flight.coalesced))
 
 # Add a new route for the chatbox page
 # @app.route('/chat')
@@ -1,9 +1,33 @@
 import os
 from datetime import timedelta
+from sqlalchemy.pool import QueuePool
 
 class Config:
     SECRET_KEY = os.urandom(24)  # Used for encrypting sessions and tokens
     SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'  # SQLite database path
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable SQLAlchemy's object modification tracking
+    SQLALCHEMY_ENGINE_OPTIONS = {  # Pooled connections, shared by the request threads
+        'poolclass': QueuePool,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+        'connect_args': {'timeout': 30, 'check_same_thread': False}
+    }
+    SQLITE_PRAGMAS = {  # Applied to every new SQLite connection (see models.configure_engines)
+        'journal_mode': 'WAL',  # Readers don't block the writer and the writer doesn't block readers
+        'synchronous': 'NORMAL',  # Safe with WAL, fsync only at checkpoints
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # Negative: KiB, i.e. 64 MiB per connection
+        'busy_timeout': 30000  # Milliseconds to wait for a lock instead of failing with "database is locked"
+    }
     SESSION_COOKIE_NAME = 'flask_session_cookie'  # Custom cookie name
-    REMEMBER_COOKIE_DURATION = timedelta(days=30)
\ No newline at end of file
+    REMEMBER_COOKIE_DURATION = timedelta(days=30)
+    PRICE_DTYPE = 'float64'  # Float dtype of prices in memory and in strategy input: 'float64' or 'float32'
+    DATASET_POLL_SECONDS = 60  # How often the web app checks merged_data.parquet for a new version
+    STRATEGY_MONITOR_WORKERS = os.cpu_count()  # Processes used by the strategy monitor for self-based strategies
+    RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Memory limit of the in-process LRU cache of strategy outputs
+    RESULT_FLOAT_DTYPE = 'float64'  # Storage dtype of float strategy outputs in the database; 'float32' halves them (lossy)
+    RESULT_UPSERT_BATCH_SIZE = 500  # Rows per executemany batch when upserting strategy results
+    RESULT_STORE = 'sql'  # Backend of strategy results: 'sql' (strategy_results table) or 'parquet' (partitioned store)
+    RESULT_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'strategy_results'))
\ No newline at end of file
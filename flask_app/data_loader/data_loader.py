@@ -1,16 +1,445 @@
 import os
+import json
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
-def load_parquet(file_path):
+NUMERICAL_COLUMNS = ['open', 'high', 'low', 'close', 'vol', 'amount']
+
+# Canonical in-memory schema: categorical ts_code, datetime64 date and prices in the configured
+# float dtype (Config.PRICE_DTYPE), decided once when the data is loaded.
+DEFAULT_PRICE_DTYPE = 'float64'
+
+# Columnar cache: one .npy per column next to the Parquet file, memory-mapped read-only by every
+# process that opens it, so web workers share the data through the OS page cache.
+CACHE_META_FILE = 'meta.json'
+
+# Sorted Parquet layout: rows ordered by (ts_code, date) in row groups of this many rows, each with
+# min/max statistics, so a single-ticker read only decodes the row groups that contain the ticker.
+PARQUET_ROW_GROUP_SIZE = 65536
+SORTED_METADATA_KEY = b'stock_monitor.sorted_by'
+
+# Partitioned store written by data_loader.ingest: a directory of Parquet parts plus this manifest
+STORE_MANIFEST_FILE = '_manifest.json'
+
+def _date_filter_value(value, field_type):
+    """Convert a date bound to the type stored in the Parquet 'date' column ('YYYYMMDD' strings or timestamps)."""
+    # Any pd.Timestamp input works ('20240102', '2024-01-02', datetime, ...)
+    if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+        return pd.Timestamp(value).strftime('%Y%m%d')
+    return pd.Timestamp(value).to_datetime64()
+
+def load_parquet(file_path, columns: list = None, ts_codes=None, start_date=None, end_date=None):
     """
-    Load a Parquet file into a Pandas DataFrame.
-    :param file_path: Path to the Parquet file.
+    Load a Parquet file (or a partitioned store directory) into a Pandas DataFrame.
+    Columns are projected and the ts_code/date conditions pushed down to pyarrow, so only the needed
+    columns are decoded and row groups whose statistics exclude the conditions are skipped.
+    :param file_path: Path to the Parquet file or store directory.
+    :param columns: Columns to load, all by default.
+    :param ts_codes: Only load these tickers.
+    :param start_date: Only load rows on or after this date.
+    :param end_date: Only load rows on or before this date.
     :return: Pandas DataFrame
     """
     try:
-        df = pd.read_parquet(file_path)
+        filters = []
+        if ts_codes is not None:
+            filters.append(('ts_code', 'in', list(ts_codes)))
+        if start_date is not None or end_date is not None:
+            # The dataset schema works for a single file and for a directory of parts
+            date_type = ds.dataset(market_data_files(file_path), format='parquet').schema.field('date').type
+            if start_date is not None:
+                filters.append(('date', '>=', _date_filter_value(start_date, date_type)))
+            if end_date is not None:
+                filters.append(('date', '<=', _date_filter_value(end_date, date_type)))
+
+        table = pq.read_table(market_data_files(file_path), columns=columns, filters=filters or None, use_threads=True)
+        df = table.to_pandas()
         print(f"Loaded Parquet file from {file_path}")
         return df
     except Exception as e:
         print(f"Failed to load Parquet file: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def is_parquet_sorted(file_path) -> bool:
+    """Check whether a Parquet file was written by sort_parquet."""
+    metadata = pq.read_metadata(file_path).metadata or {}
+    return metadata.get(SORTED_METADATA_KEY) == b'ts_code,date'
+
+def sort_parquet(file_path, output_path=None, row_group_size: int = PARQUET_ROW_GROUP_SIZE):
+    """
+    Rewrite a Parquet file sorted by (ts_code, date) with row-group statistics.
+    The file is written next to the target and renamed into place, so readers never see a partial file;
+    it keeps the permissions of the source file.
+    This is an explicit maintenance step (python -m data_loader.data_loader --sort), nothing rewrites the input implicitly.
+    :param file_path: Path to the Parquet file.
+    :param output_path: Path to write to, defaults to rewriting file_path in place.
+    :param row_group_size: Rows per row group.
+    :return: Path to the sorted file.
+    """
+    output_path = output_path or file_path
+    table = pq.read_table(file_path, use_threads=True)
+    table = table.sort_by([('ts_code', 'ascending'), ('date', 'ascending')])
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SORTED_METADATA_KEY: b'ts_code,date'})
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.sorted.', suffix='.parquet', dir=os.path.dirname(os.path.abspath(output_path)))
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, row_group_size=row_group_size, write_statistics=True)
+        # mkstemp creates the file readable by the owner only
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    print(f"Wrote {output_path} sorted by ts_code, date in row groups of {row_group_size} rows")
+    return output_path
+
+def build_ticker_index(df: pd.DataFrame) -> dict:
+    """
+    Build a ts_code -> (start, end) row offset table.
+    The DataFrame must already be sorted by ts_code so each ticker is one contiguous block.
+    :param df: DataFrame sorted by ['ts_code', 'date'].
+    :return: Dictionary mapping ts_code to its [start, end) positional range.
+    """
+    ts_code = df['ts_code']
+    if isinstance(ts_code.dtype, pd.CategoricalDtype):
+        # Compare the integer codes instead of materializing the strings
+        codes, labels = ts_code.array.codes, ts_code.cat.categories
+    else:
+        codes = labels = ts_code.to_numpy()
+    if len(codes) == 0:
+        return {}
+
+    # Positions where the ticker changes mark the block boundaries
+    boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(codes)]))
+    if labels is codes:
+        return {codes[start]: (int(start), int(end)) for start, end in zip(starts, ends)}
+    return {labels[codes[start]]: (int(start), int(end)) for start, end in zip(starts, ends)}
+
+def canonicalize_schema(df: pd.DataFrame, price_dtype: str = DEFAULT_PRICE_DTYPE) -> pd.DataFrame:
+    """
+    Convert market data to the canonical in-memory schema: categorical ts_code, datetime64 date
+    and numerical columns in price_dtype. Columns that already match are not copied.
+    :param df: Market data as loaded.
+    :param price_dtype: 'float64' or 'float32'.
+    :return: DataFrame with the canonical dtypes.
+    """
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if column == 'ts_code' and not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        elif column == 'date' and not pd.api.types.is_datetime64_any_dtype(series):
+            # Dates are stored as 'YYYYMMDD' strings (or integers)
+            series = pd.to_datetime(series.astype(str), format='%Y%m%d')
+        elif column in NUMERICAL_COLUMNS:
+            series = pd.to_numeric(series, errors='coerce').astype(price_dtype)
+        columns[column] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+def memory_usage_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Report the memory used by each column, counting the contents of object strings.
+    Memory-mapped columns are counted at their full size even though their pages are shared.
+    :param df: DataFrame to inspect.
+    :return: DataFrame indexed by column with dtype, bytes and share of the total.
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str), 'bytes': usage})
+    report['share'] = (report['bytes'] / max(int(usage.sum()), 1)).round(3)
+    return report
+
+def build_strategy_input(df: pd.DataFrame, columns: list = NUMERICAL_COLUMNS, dtype: str = None) -> pd.DataFrame:
+    """
+    Build the read-only float column view handed to every strategy.
+    Float columns keep their dtype unless one is given, so a float32 price policy reaches the strategies;
+    other columns become float64. Columns that are already in the target dtype are not copied.
+    The arrays are flagged read-only, so strategies must return new output columns instead of modifying their input.
+    :param df: DataFrame with the numerical columns.
+    :param columns: Columns to include.
+    :param dtype: Float dtype to convert to, by default each column's own float dtype.
+    :return: DataFrame of read-only float columns with df's index.
+    """
+    arrays = {}
+    for column in columns:
+        series = df[column]
+        target = dtype or (series.dtype if pd.api.types.is_float_dtype(series.dtype) else 'float64')
+        values = series.to_numpy(dtype=target).view()
+        values.flags.writeable = False
+        arrays[column] = values
+    return pd.DataFrame(arrays, index=df.index, copy=False)
+
+class StockDataset:
+    """Market data sorted by (ts_code, date) with O(1) per-ticker slicing."""
+
+    def __init__(self, df: pd.DataFrame, ticker_index: dict = None, price_dtype: str = DEFAULT_PRICE_DTYPE):
+        """
+        :param df: Market data; converted to the canonical schema and sorted here unless ticker_index is given.
+        :param ticker_index: Precomputed offset table of a df that is already canonical and sorted (e.g. from the columnar cache).
+        :param price_dtype: Float dtype of the numerical columns and the strategy input.
+        """
+        if df is None:
+            df = pd.DataFrame(columns=['ts_code', 'date'])
+        if ticker_index is None:
+            df = canonicalize_schema(df, price_dtype)
+            # Stable sort keeps the original order of duplicate (ts_code, date) rows
+            self.df = df.sort_values(['ts_code', 'date'], kind='mergesort').reset_index(drop=True)
+            self.ticker_index = build_ticker_index(self.df)
+        else:
+            self.df = df
+            self.ticker_index = ticker_index
+        # Strategy input is built once for all stocks; per-stock inputs are slices of it
+        numerical_columns = [c for c in NUMERICAL_COLUMNS if c in self.df.columns]
+        self.numeric = build_strategy_input(self.df, numerical_columns, price_dtype)
+        # Data version id, set by DatasetManager; caches of derived results key on it
+        self.version = None
+
+    def __contains__(self, ts_code):
+        return ts_code in self.ticker_index
+
+    def __len__(self):
+        return len(self.df)
+
+    def ts_codes(self) -> list:
+        """Get all ts_codes in sorted order."""
+        return list(self.ticker_index.keys())
+
+    def get_offsets(self, ts_code: str):
+        """Get the [start, end) row range of a ticker, or None if it is unknown."""
+        return self.ticker_index.get(ts_code)
+
+    def get(self, ts_code: str) -> pd.DataFrame:
+        """
+        Get all rows of one ticker as a contiguous positional slice (no boolean scan, no copy).
+        Returns an empty DataFrame if the ticker is unknown.
+        """
+        start, end = self.ticker_index.get(ts_code, (0, 0))
+        return self.df.iloc[start:end]
+
+    def get_input(self, ts_code: str) -> pd.DataFrame:
+        """Get the read-only strategy input of one ticker (a slice, no copy)."""
+        start, end = self.ticker_index.get(ts_code, (0, 0))
+        return self.numeric.iloc[start:end]
+
+    def get_panel(self, with_dates: bool = False) -> pd.DataFrame:
+        """
+        Get the strategy input of all stocks plus the 'ts_code' column, for panel mode, as read-only views.
+        :param with_dates: Also include the datetime64 'date' column, e.g. for cross-sectional strategies.
+        """
+        columns = {'ts_code': self.df['ts_code']}
+        if with_dates:
+            columns['date'] = self.df['date']
+        columns.update({column: self.numeric[column] for column in self.numeric.columns})
+        return pd.DataFrame(columns, index=self.df.index, copy=False)
+
+    def slice_aligned(self, other: pd.DataFrame, ts_code: str) -> pd.DataFrame:
+        """Slice a frame row-aligned with self.df (e.g. a cross-based result) to one ticker."""
+        start, end = self.ticker_index.get(ts_code, (0, 0))
+        return other.iloc[start:end]
+
+    def memory_usage(self) -> pd.DataFrame:
+        """Per-column memory usage of the dataset, see memory_usage_report."""
+        return memory_usage_report(self.df)
+
+    @classmethod
+    def from_cache(cls, cache_dir: str):
+        """Open a columnar cache written by build_columnar_cache, memory-mapping every column read-only.
+        The cache is already in the canonical schema of its price dtype."""
+        with open(os.path.join(cache_dir, CACHE_META_FILE)) as f:
+            meta = json.load(f)
+
+        columns = {}
+        for column, info in meta['columns'].items():
+            values = np.load(os.path.join(cache_dir, f"{column}.npy"), mmap_mode='r')
+            if info['kind'] == 'dictionary':
+                # Only the small category list is held in memory, the per-row codes stay mapped
+                values = pd.Categorical.from_codes(values, categories=info['categories'])
+            columns[column] = values
+
+        ticker_index = {ts_code: (start, end) for ts_code, start, end in meta['ticker_index']}
+        return cls(pd.DataFrame(columns, copy=False), ticker_index, meta['price_dtype'])
+
+def get_cache_dir(file_path: str) -> str:
+    """Get the columnar cache directory of a Parquet file."""
+    return f"{file_path}.cache"
+
+def source_stat(file_path: str) -> os.stat_result:
+    """Stat a market data source; for a partitioned store this is its manifest, which changes on every ingest."""
+    if os.path.isdir(file_path):
+        return os.stat(os.path.join(file_path, STORE_MANIFEST_FILE))
+    return os.stat(file_path)
+
+def market_data_files(file_path: str):
+    """
+    Get what to read of a market data source: the Parquet file itself, or the parts listed in a store's manifest.
+    Only listed parts are read, so parts being written or replaced by a compaction are never seen twice.
+    :param file_path: Path to the Parquet file or store directory.
+    :return: The file path, or the list of part paths.
+    """
+    if not os.path.isdir(file_path):
+        return file_path
+    with open(os.path.join(file_path, STORE_MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    return [os.path.join(file_path, part['file']) for part in manifest['parts']]
+
+def resolve_market_data_path(parquet_file_path: str) -> str:
+    """
+    Get the market data source to read: the partitioned store next to the Parquet file
+    (e.g. data/merged_data/) once it has been seeded with the history (ingest.seed_store, done by the
+    first ingest), otherwise the Parquet file itself. A store that was never seeded holds only deltas
+    and is not used.
+    :param parquet_file_path: Path to merged_data.parquet.
+    :return: Path to the store directory or the Parquet file.
+    """
+    store_dir = os.path.splitext(parquet_file_path)[0]
+    manifest_path = os.path.join(store_dir, STORE_MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return parquet_file_path
+    with open(manifest_path) as f:
+        if json.load(f).get('seeded'):
+            return store_dir
+    print(f"Store {store_dir} was never seeded from {parquet_file_path}, reading the Parquet file instead")
+    return parquet_file_path
+
+def _source_signature(file_path: str) -> dict:
+    stat = source_stat(file_path)
+    return {'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size}
+
+def is_cache_fresh(file_path: str, cache_dir: str = None, price_dtype: str = DEFAULT_PRICE_DTYPE) -> bool:
+    """
+    Check whether the columnar cache of a Parquet file exists and was built from its current version.
+    :param file_path: Path to the Parquet file.
+    :param cache_dir: Cache directory, defaults to get_cache_dir(file_path).
+    :param price_dtype: Price dtype the cache must have been built with.
+    :return: True if the cache can be used as is.
+    """
+    cache_dir = cache_dir or get_cache_dir(file_path)
+    try:
+        with open(os.path.join(cache_dir, CACHE_META_FILE)) as f:
+            meta = json.load(f)
+        signature = _source_signature(file_path)
+    except (OSError, ValueError):
+        return False
+    signature['price_dtype'] = price_dtype
+    return all(meta.get(key) == value for key, value in signature.items())
+
+def _write_cache_column(directory: str, column: str, series: pd.Series) -> dict:
+    """Write one column; categorical and string columns are dictionary-encoded as integer codes plus a category list."""
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        np.save(os.path.join(directory, f"{column}.npy"), series.to_numpy())
+        return {'kind': 'plain', 'dtype': str(series.dtype)}
+
+    codes, categories = pd.factorize(series, sort=True)
+    # Use the code width pandas itself would choose, so Categorical keeps the mapped codes without a copy
+    codes = pd.Categorical.from_codes(codes, categories=categories).codes
+    np.save(os.path.join(directory, f"{column}.npy"), codes)
+    return {'kind': 'dictionary', 'dtype': str(codes.dtype), 'categories': [str(c) for c in categories]}
+
+def build_columnar_cache(file_path: str, cache_dir: str = None, price_dtype: str = DEFAULT_PRICE_DTYPE) -> str:
+    """
+    Convert a Parquet file into the columnar cache: the canonical schema with rows sorted by ts_code, date,
+    plus the ticker offset table.
+    The cache is written to a temporary directory and renamed into place, so readers never see a partial cache.
+    :param file_path: Path to the Parquet file.
+    :param cache_dir: Cache directory, defaults to get_cache_dir(file_path).
+    :param price_dtype: Float dtype of the numerical columns.
+    :return: Path to the cache directory.
+    """
+    cache_dir = cache_dir or get_cache_dir(file_path)
+    signature = _source_signature(file_path)
+    dataset = StockDataset(pq.read_table(market_data_files(file_path), use_threads=True).to_pandas(), price_dtype=price_dtype)
+
+    parent, name = os.path.split(os.path.abspath(cache_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=f".{name}.", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)  # mkdtemp is private to the owner; the cache is shared read-only
+        columns = {column: _write_cache_column(tmp_dir, column, dataset.df[column]) for column in dataset.df.columns}
+        meta = dict(signature, price_dtype=price_dtype, n_rows=len(dataset), columns=columns, ticker_index=[
+            [ts_code, start, end] for ts_code, (start, end) in dataset.ticker_index.items()
+        ])
+        with open(os.path.join(tmp_dir, CACHE_META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        # Move a stale cache aside first; processes that still map it keep their open files
+        if os.path.isdir(cache_dir):
+            stale_dir = tempfile.mkdtemp(prefix=f".{name}.stale.", dir=parent)
+            try:
+                os.rename(cache_dir, os.path.join(stale_dir, name))
+            except FileNotFoundError:
+                pass  # Another process replaced it concurrently
+            shutil.rmtree(stale_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # Another process finished its build first; keep that one
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    print(f"Built columnar cache for {file_path} in {cache_dir}")
+    return cache_dir
+
+def load_dataset(file_path, use_cache: bool = True, price_dtype: str = DEFAULT_PRICE_DTYPE):
+    """
+    Load a Parquet file into a StockDataset indexed by ticker.
+    By default the data is served from the memory-mapped columnar cache, which is (re)built when stale.
+    :param file_path: Path to the Parquet file.
+    :param use_cache: Whether to use the columnar cache.
+    :param price_dtype: Float dtype of the numerical columns, 'float64' or 'float32'.
+    :return: StockDataset (empty if loading failed)
+    """
+    dataset = None
+    if use_cache and file_path and os.path.exists(file_path):
+        try:
+            cache_dir = get_cache_dir(file_path)
+            if not is_cache_fresh(file_path, cache_dir, price_dtype):
+                build_columnar_cache(file_path, cache_dir, price_dtype)
+            dataset = StockDataset.from_cache(cache_dir)
+            print(f"Loaded columnar cache from {cache_dir}")
+        except Exception as e:
+            print(f"Failed to use columnar cache, loading Parquet directly: {e}")
+    if dataset is None:
+        dataset = StockDataset(load_parquet(file_path), price_dtype=price_dtype)
+
+    usage = dataset.memory_usage()
+    print(f"Dataset memory usage: {usage['bytes'].sum() / 2**20:.1f} MiB "
+          f"({', '.join(f'{column}: {row.bytes / 2**20:.1f}' for column, row in usage.iterrows())})")
+    return dataset
+
+def save_columns_npy(df: pd.DataFrame, directory: str) -> dict:
+    """
+    Write each column of a numeric DataFrame to `<directory>/<column>.npy` for memory-mapping.
+    :param df: DataFrame of numeric columns.
+    :param directory: Existing directory to write into.
+    :return: Dictionary mapping column name to file path.
+    """
+    paths = {}
+    for column in df.columns:
+        paths[column] = os.path.join(directory, f"{column}.npy")
+        np.save(paths[column], df[column].to_numpy())
+    return paths
+
+def load_columns_npy(paths: dict) -> pd.DataFrame:
+    """
+    Memory-map columns written by save_columns_npy as a read-only DataFrame (no copy).
+    Every process mapping the same files shares their pages through the OS page cache.
+    :param paths: Dictionary mapping column name to .npy file path.
+    :return: DataFrame backed by the memory-mapped files.
+    """
+    return pd.DataFrame({column: np.load(path, mmap_mode='r') for column, path in paths.items()}, copy=False)
+
+if __name__ == '__main__':
+    import sys
+    # Usage: python -m data_loader.data_loader --sort [parquet file]
+    if len(sys.argv) < 2 or sys.argv[1] != '--sort':
+        sys.exit("Usage: python -m data_loader.data_loader --sort [parquet file]")
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+    sort_parquet(sys.argv[2] if len(sys.argv) > 2 else os.path.join(data_dir, 'merged_data.parquet'))
@@ -1,67 +1,53 @@
-from strategies.StrategyManager import StrategyManager
+from strategies.StrategyManager import StrategyManager, get_params_hash
+from strategies.EvaluationContext import EvaluationContext
+from data_loader.data_loader import build_strategy_input
+from data_loader.downsampling import bucket_first, downsample_ohlc, lttb_indices
+from data_loader.result_cache import strategy_result_cache
+import numpy as np
 import pandas as pd
-from models import db, StrategyResult
-import hashlib
-import json
-from datetime import datetime, timedelta
-
-def get_params_hash(params: dict) -> str:
-    """Create a hash of strategy parameters for caching."""
-    # Sort the params to ensure consistent hashing
-    sorted_params = json.dumps(params, sort_keys=True)
-    return hashlib.sha256(sorted_params.encode()).hexdigest()
+from data_loader.result_store import get_result_store
 
 def get_cached_result(ts_code: str, strategy_name: str, params_hash: str) -> dict:
-    """Get cached strategy result if available and not too old."""
-    cached = StrategyResult.query.filter_by(
-        ts_code=ts_code,
-        strategy_name=strategy_name,
-        params_hash=params_hash
-    ).first()
-    
-    if cached:
-        # Check if result is less than 24 hours old
-        if datetime.utcnow() - cached.updated_at < timedelta(hours=24):
-            return cached.result_data
-        # Delete old cache
-        db.session.delete(cached)
-        db.session.commit()
-    return None
-
-def save_strategy_result(ts_code: str, strategy_name: str, params_hash: str, result_data: dict):
-    """Save or update strategy result in the database."""
-    try:
-        # Try to find existing record
-        cached = StrategyResult.query.filter_by(
-            ts_code=ts_code,
-            strategy_name=strategy_name,
-            params_hash=params_hash
-        ).first()
-
-        if cached:
-            cached.result_data = result_data
-            cached.updated_at = datetime.utcnow()
-        else:
-            new_result = StrategyResult(
-                ts_code=ts_code,
-                strategy_name=strategy_name,
-                params_hash=params_hash,
-                result_data=result_data
-            )
-            db.session.add(new_result)
-        
-        db.session.commit()
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error saving strategy result: {e}")
-
-def process_main_stock_data(df: pd.DataFrame) -> dict:
-    """Process main stock data for visualization."""
-    df = df.copy()  # Explicitly create a copy
-    x_data = df['date'].tolist()
-    df[['open', 'close', 'low', 'high']] = df[['open', 'close', 'low', 'high']].astype(float)
-    candle_data = df[['open', 'close', 'low', 'high']].values.tolist()
-    close_prices = df['close'].astype(float).tolist()
+    """Get cached strategy result if available and not too old (24 hours), from the configured result store."""
+    return get_result_store().get(ts_code, strategy_name, params_hash)
+
+def save_strategy_results(rows: list, batch_size: int = None) -> int:
+    """
+    Save strategy results in bulk to the configured result store (Config.RESULT_STORE).
+    :param rows: Dicts with ts_code, strategy_name, params_hash, result_data and the stock's dates.
+    :param batch_size: Rows per write batch (default Config.RESULT_UPSERT_BATCH_SIZE).
+    :return: Number of rows saved (0 on failure).
+    """
+    return get_result_store().save(rows, batch_size)
+
+def save_strategy_result(ts_code: str, strategy_name: str, params_hash: str, result_data: dict, dates=None):
+    """Save or update strategy result in the configured result store."""
+    save_strategy_results([{
+        'ts_code': ts_code,
+        'strategy_name': strategy_name,
+        'params_hash': params_hash,
+        'result_data': result_data,
+        'dates': dates
+    }])
+
+def process_main_stock_data(df: pd.DataFrame, edges: np.ndarray = None) -> dict:
+    """
+    Process main stock data for visualization.
+    Series are returned as NumPy arrays (dates as datetime64); response_encoding formats them per response type.
+    With bucket edges (see downsampling.bucket_edges) every bucket becomes one chart point:
+    an OHLC-aggregated candle labelled with the bucket's first date, and the LTTB-selected close.
+    """
+    x_data = df['date'].to_numpy()
+    # Float64 columns are read as views, so nothing is copied before serialization
+    ohlc = [df[column].to_numpy(dtype='float64') for column in ['open', 'close', 'low', 'high']]
+    close_prices = ohlc[1]
+
+    if edges is not None:
+        x_data = bucket_first(x_data, edges)
+        ohlc = downsample_ohlc(*ohlc, edges)
+        close_prices = close_prices[lttb_indices(close_prices, edges)]
+
+    candle_data = np.column_stack(ohlc)
     
     return {
         'x_data': x_data,
@@ -69,23 +55,81 @@ def process_main_stock_data(df: pd.DataFrame) -> dict:
         'close_prices': close_prices
     }
 
-def process_strategy_data(df: pd.DataFrame, strategy_configs: list) -> dict:
+def resolve_window(dates: pd.Series, start=None, end=None, last_n: int = None) -> tuple:
+    """
+    Resolve a date range and/or a number of trailing bars to a row range of one stock.
+    
+    :param dates: The stock's dates in ascending order (datetime64 or 'YYYYMMDD' strings).
+    :param start: First date to include (anything pd.Timestamp accepts, e.g. '20240102').
+    :param end: Last date to include.
+    :param last_n: Keep at most this many bars at the end of the range.
+    :return: (lo, hi) positional [lo, hi) range.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates.astype(str), format='%Y%m%d')
+    values = dates.to_numpy()
+
+    lo, hi = 0, len(values)
+    if start is not None:
+        lo = int(np.searchsorted(values, pd.Timestamp(start).to_datetime64(), side='left'))
+    if end is not None:
+        hi = int(np.searchsorted(values, pd.Timestamp(end).to_datetime64(), side='right'))
+    if last_n is not None:
+        if int(last_n) < 0:
+            raise ValueError("last_n must not be negative")
+        lo = max(lo, hi - int(last_n))
+    return lo, max(lo, hi)
+
+def get_strategy_params_hashes(strategy_configs: list) -> dict:
+    """
+    Hash the adjusted parameters of every requested strategy without calculating anything,
+    e.g. to tag a response before deciding whether it has to be computed.
+    :param strategy_configs: List of strategy configurations.
+    :return: Dictionary mapping strategy names to get_params_hash of their adjusted params (None if unknown).
+    """
+    hashes = {}
+    for config in strategy_configs:
+        strategy = StrategyManager.get_strategy(config["name"])
+        if not strategy:
+            hashes[config["name"]] = None
+            continue
+        hashes[config["name"]] = get_params_hash(StrategyManager.adjust_params(strategy, config.get("params", {})))
+    return hashes
+
+def process_strategy_data(df: pd.DataFrame, strategy_configs: list, strategy_input: pd.DataFrame = None,
+                          window: tuple = None, edges: np.ndarray = None, data_version: str = None) -> dict:
     """
     Process stock data using the provided strategy configurations.
-    Attempts to use cached results when available.
+    Attempts to use cached results when available: strategy outputs are kept in the in-memory
+    strategy_result_cache, keyed by the data version, so only the first request of a dataset version computes them.
+    
+    With a window, each strategy is calculated over the window plus its warm-up (get_lookback) only,
+    and the outputs are sliced to the window.
     
     :param df: DataFrame containing stock data.
     :param strategy_configs: List of strategy configurations.
-    :return: Dictionary with strategy names and calculated results.
+    :param strategy_input: Pre-built read-only float input (e.g. StockDataset.get_input); built from df if omitted.
+    :param window: Optional (lo, hi) positional row range to return, see resolve_window.
+    :param edges: Optional bucket edges over the window; every output is downsampled with LTTB on them.
+    :param data_version: Version id of the dataset df comes from (StockDataset.version); results are not cached without it.
+    :return: Dictionary with strategy names and calculated results (output data as NumPy arrays).
     """
     results = {}
     manager = StrategyManager()
     ts_code = df['ts_code'].iloc[0]  # Get the stock code
+    dates = df['date'].to_numpy()
 
-    df = df.copy()
-    numerical_columns = ['open', 'high', 'low', 'close', 'vol', 'amount']
-    df = df[numerical_columns].copy()
-    df = df.astype(float)
+    # All strategies share one read-only view of the numerical columns
+    df = strategy_input if strategy_input is not None else build_strategy_input(df)
+    lo, hi = window or (0, len(df))
+    full_history = (lo, hi) == (0, len(df))
+
+    # Newly computed full-history results, saved in one upsert at the end (if the store is written per request)
+    save_results = get_result_store().saves_on_request
+    rows_to_save = []
+
+    # Intermediates (rolling means, EMAs, diffs, ...) are computed once per input start and shared by all strategies
+    contexts = {}
 
     for config in strategy_configs:
         strategy = manager.get_strategy(config["name"])
@@ -98,9 +142,7 @@ def process_strategy_data(df: pd.DataFrame, strategy_configs: list) -> dict:
             strategy_config = strategy.get_config()
             
             # Get and adjust input parameters
-            input_params = strategy.get_input_parameters()
-            adjusted_params = {param: config["params"].get(param, default) 
-                             for param, default in input_params.items()}
+            adjusted_params = manager.adjust_params(strategy, config.get("params", {}))
             
             # print(f"Adjusted parameters: {adjusted_params}")
             # Generate hash for these parameters
@@ -112,8 +154,22 @@ def process_strategy_data(df: pd.DataFrame, strategy_configs: list) -> dict:
             #     results[strategy.name()] = cached_result
             #     continue
 
-            # Calculate new results if no cache available
-            df_result = strategy.calculate(df, **adjusted_params).bfill().ffill()
+            # Calculate new results if no cache available, starting at the window minus the strategy's warm-up
+            lookback = strategy.get_lookback(**adjusted_params)
+            calc_start = 0 if lookback is None else max(0, lo - lookback)
+
+            computed = []
+
+            def calculate():
+                computed.append(True)
+                if calc_start not in contexts:
+                    contexts[calc_start] = EvaluationContext(df.iloc[calc_start:hi])
+                context = contexts[calc_start]
+                return strategy.calculate(context.data, context=context, **adjusted_params)
+
+            cache_key = strategy_result_cache.make_key(data_version, ts_code, strategy.name(), params_hash, (calc_start, hi))
+            df_result = strategy_result_cache.get_or_compute(cache_key, calculate).bfill().ffill()
+            df_result = df_result.iloc[lo - calc_start:]
 
             # Create the result entry
             result_entry = {
@@ -134,11 +190,22 @@ def process_strategy_data(df: pd.DataFrame, strategy_configs: list) -> dict:
                     'order': 1
                 })
                 
-                result_entry['data'][output_name] = df_result[output_name].tolist()
+                values = df_result[output_name].to_numpy()
+                if edges is not None:
+                    values = values[lttb_indices(values, edges)]
+                result_entry['data'][output_name] = values
                 result_entry['config']['outputs'][output_name] = output_config
 
-            # Save result to cache
-            save_strategy_result(ts_code, strategy.name(), params_hash, result_entry)
+            # Save newly computed results to the database; a windowed or downsampled result is only part of the series
+            if save_results and computed and full_history and edges is None:
+                stored_data = {output_name: values.tolist() for output_name, values in result_entry['data'].items()}
+                rows_to_save.append({
+                    'ts_code': ts_code,
+                    'strategy_name': strategy.name(),
+                    'params_hash': params_hash,
+                    'result_data': dict(result_entry, data=stored_data),
+                    'dates': dates
+                })
             
             # Store in results
             results[strategy.name()] = result_entry
@@ -146,4 +213,9 @@ def process_strategy_data(df: pd.DataFrame, strategy_configs: list) -> dict:
         except Exception as e:
             results[config["name"]] = {"error": f"Error with strategy {config['name']}: {str(e)}"}
 
+    # Saving is only a cache write; a failure must never fail the response
+    try:
+        save_strategy_results(rows_to_save)
+    except Exception as e:
+        print(f"Error saving strategy results: {e}")
     return results
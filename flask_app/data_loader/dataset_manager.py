@@ -0,0 +1,95 @@
+import threading
+from data_loader.data_loader import StockDataset, load_dataset, source_stat, resolve_market_data_path, DEFAULT_PRICE_DTYPE
+
+def get_data_version(file_path: str):
+    """
+    Get the data version id of a Parquet file or partitioned store, derived from its mtime and size.
+    Every process computes the same id for the same file, so it is safe to use in shared cache keys.
+    :param file_path: Path to the Parquet file or store directory.
+    :return: Version id string, or None if the file does not exist.
+    """
+    try:
+        stat = source_stat(file_path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+class DatasetManager:
+    """
+    Holds the current StockDataset of a Parquet file and hot-reloads it when the file changes.
+    The new version is loaded in the background and swapped in with a single reference assignment;
+    requests that already called get() keep using the version they got.
+    The source is resolved on every poll (resolve_market_data_path), so a partitioned store seeded
+    while the app runs is picked up without a restart, the same way the strategy monitor picks it up.
+    """
+
+    def __init__(self, file_path: str, poll_interval: float = 60, price_dtype: str = DEFAULT_PRICE_DTYPE):
+        """
+        :param file_path: Path to merged_data.parquet (or a store directory).
+        :param poll_interval: Seconds between checks for a new version.
+        :param price_dtype: Float dtype of the numerical columns.
+        """
+        self.file_path = file_path
+        self.source_path = None  # Source the current dataset was loaded from
+        self.poll_interval = poll_interval
+        self.price_dtype = price_dtype
+        self._dataset = StockDataset(None)
+        self._reload_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.reload()
+
+    def get(self) -> StockDataset:
+        """Get the current dataset. Callers should hold on to it for the whole request."""
+        return self._dataset
+
+    @property
+    def version(self):
+        """Data version id of the current dataset."""
+        return self._dataset.version
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load the market data again if it changed, or moved to a new source, since the current version was loaded.
+        :param force: Reload even if the version id is unchanged.
+        :return: True if a new version was swapped in.
+        """
+        with self._reload_lock:
+            source_path = resolve_market_data_path(self.file_path)
+            version = get_data_version(source_path)
+            if version is None or (version == self._dataset.version and source_path == self.source_path and not force):
+                return False
+
+            dataset = load_dataset(source_path, price_dtype=self.price_dtype)
+            if len(dataset) == 0 and len(self._dataset) > 0:
+                # Most likely a refresh in progress; keep serving the old version and retry on the next poll
+                print(f"Loaded an empty dataset from {source_path}, keeping version {self._dataset.version}")
+                return False
+
+            dataset.version = version
+            self._dataset = dataset
+            self.source_path = source_path
+            print(f"Loaded dataset version {version} from {source_path}")
+            return True
+
+    def start(self):
+        """Start polling the Parquet file in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._poll, name='dataset-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background polling thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Failed to reload dataset: {e}")
@@ -0,0 +1,71 @@
+import numpy as np
+
+# Downsampling of chart series. All series of a response share one set of buckets (one chart point
+# per bucket), so candles, lines and bars stay aligned on the same x-axis categories.
+
+def bucket_edges(n: int, max_points: int):
+    """
+    Split n rows into at most max_points buckets in the LTTB layout: the first and last rows are
+    buckets of their own and the rows in between are split evenly.
+    :param n: Number of rows.
+    :param max_points: Maximum number of buckets (at least 3).
+    :return: Array of max_points + 1 bucket edges, or None if no downsampling is needed.
+    """
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    if n <= max_points:
+        return None
+    inner = np.linspace(1, n - 1, max_points - 1).astype(int)
+    return np.concatenate(([0], inner, [n]))
+
+def bucket_first(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Value of the first row of every bucket (e.g. the x-axis labels)."""
+    return values[edges[:-1]]
+
+def downsample_ohlc(open_: np.ndarray, close: np.ndarray, low: np.ndarray, high: np.ndarray, edges: np.ndarray):
+    """
+    Aggregate candles per bucket: first open, last close, lowest low and highest high (NaN ignored).
+    :return: Tuple of (open, close, low, high) arrays with one value per bucket.
+    """
+    starts = edges[:-1]
+    return (
+        open_[starts],
+        close[edges[1:] - 1],
+        np.fmin.reduceat(low, starts),
+        np.fmax.reduceat(high, starts)
+    )
+
+def lttb_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: from every bucket keep the point that forms the largest triangle
+    with the point kept from the previous bucket and the average of the next bucket, so peaks and
+    troughs survive downsampling.
+    :param values: Series values (NaN allowed).
+    :param edges: Bucket edges from bucket_edges.
+    :return: Row position of the kept point of every bucket.
+    """
+    values = np.asarray(values, dtype='float64')
+    n_buckets = len(edges) - 1
+    selected = np.empty(n_buckets, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = len(values) - 1
+
+    for i in range(1, n_buckets - 1):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        next_values = values[next_start:next_end]
+        next_x = (next_start + next_end - 1) / 2
+        next_y = np.nanmean(next_values) if not np.isnan(next_values).all() else np.nan
+
+        a = selected[i - 1]
+        xs = np.arange(start, end)
+        ys = values[start:end]
+        areas = np.abs((a - next_x) * (ys - values[a]) - (a - xs) * (next_y - values[a]))
+        if np.isnan(areas).all():
+            # No usable triangle (NaN neighbours): keep the first valid point of the bucket, if any
+            valid = np.flatnonzero(~np.isnan(ys))
+            selected[i] = start + (valid[0] if len(valid) else 0)
+        else:
+            selected[i] = start + int(np.nanargmax(areas))
+
+    return selected
@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_loader.data_loader import NUMERICAL_COLUMNS, STORE_MANIFEST_FILE, load_parquet
+
+# Schema of every part in the store: the canonical types (dictionary-encoded ts_code, timestamp date,
+# float64 prices), so loading the store needs no conversion; only the delta is converted on ingest.
+STORE_SCHEMA = pa.schema(
+    [('ts_code', pa.dictionary(pa.int32(), pa.string())), ('date', pa.timestamp('us'))]
+    + [(column, pa.float64()) for column in NUMERICAL_COLUMNS]
+)
+# Dates in the manifest (part ranges, last ingested date per ticker)
+MANIFEST_DATE_FORMAT = '%Y%m%d'
+
+# A period (month or year) with this many parts is merged into one part, see compact_store
+COMPACT_MIN_PARTS = 8
+PERIOD_PREFIX = {'month': 6, 'year': 4}  # Length of the 'YYYYMMDD' prefix naming a period
+
+def read_manifest(store_dir: str) -> dict:
+    """
+    Read the store manifest: the ingested parts and the last ingested date of every ticker.
+    :param store_dir: Path to the store directory.
+    :return: Manifest dictionary (empty for a new store)
+    """
+    try:
+        with open(os.path.join(store_dir, STORE_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'parts': [], 'last_date': {}, 'seeded': False}
+
+def _write_manifest(store_dir: str, manifest: dict):
+    tmp_path = os.path.join(store_dir, f".{STORE_MANIFEST_FILE}.{uuid.uuid4().hex}")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(store_dir, STORE_MANIFEST_FILE))
+
+def _remove_orphan_parts(store_dir: str, manifest: dict):
+    """
+    Remove parts that are not in the manifest: left behind by an ingestion that stopped before its
+    manifest update, or replaced by an earlier compaction (kept until now for readers that listed them).
+    """
+    known = {part['file'] for part in manifest['parts']}
+    for name in os.listdir(store_dir):
+        if name.endswith('.parquet') and name not in known:
+            print(f"Removing part {name}, not in the manifest")
+            os.remove(os.path.join(store_dir, name))
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert new bars to the store schema: categorical ts_code, datetime64 date and float64 prices.
+    Only the delta goes through this, the stored data is never converted again.
+    """
+    dates = df['date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates.astype(str), format='%Y%m%d')
+
+    columns = {'ts_code': df['ts_code'].astype(str).astype('category'), 'date': dates}
+    for column in NUMERICAL_COLUMNS:
+        columns[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+    return pd.DataFrame(columns, index=df.index)
+
+def read_delta(delta_path: str) -> pd.DataFrame:
+    """Read a delta file of new bars (Parquet, or CSV by extension)."""
+    if delta_path.endswith('.csv'):
+        return pd.read_csv(delta_path, dtype={'ts_code': str, 'date': str}, float_precision='round_trip')
+    df = load_parquet(delta_path, columns=['ts_code', 'date'] + NUMERICAL_COLUMNS)
+    if df is None:
+        raise ValueError(f"Failed to read delta file {delta_path}")
+    return df
+
+def _update_last_date(manifest: dict, df: pd.DataFrame):
+    last_date = df.groupby('ts_code', sort=False, observed=True)['date'].max().dt.strftime(MANIFEST_DATE_FORMAT)
+    manifest['last_date'].update(last_date.to_dict())
+
+def _write_part(store_dir: str, manifest: dict, df: pd.DataFrame, prefix: str = 'part'):
+    """Write normalized, sorted bars as a new part and add it to the manifest's parts (not yet written)."""
+    min_date, max_date = (date.strftime(MANIFEST_DATE_FORMAT) for date in (df['date'].min(), df['date'].max()))
+    name = f"{prefix}-{min_date}-{max_date}-{uuid.uuid4().hex[:8]}.parquet"
+    tmp_path = os.path.join(store_dir, f".{name}")
+    table = pa.Table.from_pandas(df, schema=STORE_SCHEMA, preserve_index=False)
+    pq.write_table(table, tmp_path, write_statistics=True)
+    os.replace(tmp_path, os.path.join(store_dir, name))
+
+    manifest['parts'].append({'file': name, 'rows': len(df), 'min_date': min_date, 'max_date': max_date})
+
+def default_seed_path(store_dir: str) -> str:
+    """The Parquet file a store replaces, e.g. data/merged_data.parquet for data/merged_data/."""
+    return os.path.normpath(store_dir) + '.parquet'
+
+def seed_store(store_dir: str, seed_path: str = None) -> int:
+    """
+    Create a store from the existing history (merged_data.parquet) as its first part
+    (python -m data_loader.ingest seed, or automatically on the first ingest_delta).
+    The readers switch from the Parquet file to the store only once it is seeded (see
+    resolve_market_data_path), so no history is lost when the first delta is ingested.
+    A store is seeded empty if the Parquet file does not exist (a fresh install).
+
+    :param store_dir: Path to the store directory, created if needed
+    :param seed_path: Parquet file with the history, defaults to default_seed_path(store_dir)
+    :return: Number of rows copied into the store
+    """
+    seed_path = seed_path or default_seed_path(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = read_manifest(store_dir)
+    if manifest.get('seeded'):
+        print(f"Store {store_dir} is already seeded")
+        return 0
+    _remove_orphan_parts(store_dir, manifest)
+
+    rows = 0
+    if os.path.exists(seed_path):
+        df = read_delta(seed_path)
+        df = normalize_bars(df).drop_duplicates(['ts_code', 'date'], keep='last')
+        df = df.sort_values(['ts_code', 'date'], kind='mergesort')
+        if not df.empty:
+            _write_part(store_dir, manifest, df, prefix='seed')
+            _update_last_date(manifest, df)
+            rows = len(df)
+    else:
+        print(f"No history at {seed_path}, seeding {store_dir} empty")
+
+    manifest['seeded'] = True
+    _write_manifest(store_dir, manifest)
+    print(f"Seeded {store_dir} with {rows} bars from {seed_path}")
+    return rows
+
+def ingest_delta(delta, store_dir: str, seed_path: str = None) -> int:
+    """
+    Append new bars to the partitioned store.
+    Rows on or before a ticker's last ingested date are skipped, so re-ingesting a delta is a no-op.
+    The cost is proportional to the delta: only the manifest is read from the store.
+    The first ingest into a new store seeds it from the existing history first (see seed_store).
+
+    :param delta: DataFrame of new bars, or path to a delta file
+    :param store_dir: Path to the store directory, created if needed
+    :param seed_path: History to seed a new store from, defaults to default_seed_path(store_dir)
+    :return: Number of rows appended
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = read_manifest(store_dir)
+    if not manifest.get('seeded'):
+        seed_store(store_dir, seed_path)
+        manifest = read_manifest(store_dir)
+    _remove_orphan_parts(store_dir, manifest)
+
+    df = read_delta(delta) if isinstance(delta, str) else delta
+    df = normalize_bars(df)
+
+    # Skip rows that are already in the store, and keep the last copy of duplicate bars within the delta
+    last_date = pd.to_datetime(df['ts_code'].astype(str).map(manifest['last_date']), format=MANIFEST_DATE_FORMAT)
+    df = df[last_date.isna() | (df['date'] > last_date)]
+    df = df.drop_duplicates(['ts_code', 'date'], keep='last').sort_values(['ts_code', 'date'], kind='mergesort')
+    if df.empty:
+        print(f"No new bars to ingest into {store_dir}")
+        return 0
+
+    _write_part(store_dir, manifest, df)
+    _update_last_date(manifest, df)
+    _write_manifest(store_dir, manifest)
+
+    print(f"Ingested {len(df)} bars for {df['ts_code'].nunique()} stocks into {store_dir}")
+    compact_store(store_dir)
+    return len(df)
+
+def _period(part: dict, period: str):
+    """The period a part falls in, or None if it spans several (e.g. the seed part)."""
+    length = PERIOD_PREFIX[period]
+    start, end = part['min_date'][:length], part['max_date'][:length]
+    return start if start == end else None
+
+def compact_store(store_dir: str, period: str = 'month', min_parts: int = COMPACT_MIN_PARTS) -> int:
+    """
+    Merge the parts of every period (month or year) that has at least min_parts parts into one part,
+    so daily ingests do not leave hundreds of small files that every load has to open.
+    ingest_delta compacts by month; compacting by year is a periodic maintenance step
+    (python -m data_loader.ingest compact --period year).
+    The merged part is swapped in with the manifest; the replaced parts are only deleted by the next
+    ingest or compaction, as readers may still be reading the parts of the previous manifest.
+
+    :param store_dir: Path to the store directory
+    :param period: 'month' or 'year'
+    :param min_parts: Only merge periods with at least this many parts
+    :return: Number of parts merged away
+    """
+    manifest = read_manifest(store_dir)
+    _remove_orphan_parts(store_dir, manifest)
+
+    periods = {}
+    for part in manifest['parts']:
+        key = _period(part, period)
+        if key is not None:
+            periods.setdefault(key, []).append(part)
+
+    merged = 0
+    for key, parts in sorted(periods.items()):
+        if len(parts) < max(min_parts, 2):
+            continue
+        df = pq.read_table([os.path.join(store_dir, part['file']) for part in parts]).to_pandas()
+        # Categories of the unified dictionaries are in first-seen order; sort the rows by ticker name
+        df['ts_code'] = df['ts_code'].cat.reorder_categories(sorted(df['ts_code'].cat.categories))
+        df = df.sort_values(['ts_code', 'date'], kind='mergesort').reset_index(drop=True)
+
+        replaced = {part['file'] for part in parts}
+        manifest['parts'] = [part for part in manifest['parts'] if part['file'] not in replaced]
+        _write_part(store_dir, manifest, df)
+        merged += len(parts)
+        print(f"Compacted {len(parts)} parts of {key} into one")
+
+    if merged:
+        manifest['parts'].sort(key=lambda part: (part['min_date'], part['max_date']))
+        _write_manifest(store_dir, manifest)
+    return merged
+
+if __name__ == "__main__":
+    import argparse
+
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data'))
+    parser = argparse.ArgumentParser(description="Maintain the partitioned market data store.")
+    parser.add_argument('--store', default=os.path.join(data_dir, 'merged_data'),
+                        help="Store directory (default: data/merged_data)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help="Append a delta file of new bars (seeds a new store first)")
+    ingest_parser.add_argument('delta', help="Delta file (Parquet or CSV)")
+    seed_parser = commands.add_parser('seed', help="Seed the store from merged_data.parquet")
+    seed_parser.add_argument('--from', dest='seed_path', help="Parquet file to seed from (default: <store>.parquet)")
+    compact_parser = commands.add_parser('compact', help="Merge the parts of every month or year")
+    compact_parser.add_argument('--period', choices=sorted(PERIOD_PREFIX), default='year')
+    compact_parser.add_argument('--min-parts', type=int, default=2, help="Only merge periods with this many parts")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        ingest_delta(args.delta, args.store)
+    elif args.command == 'seed':
+        seed_store(args.store, args.seed_path)
+    else:
+        compact_store(args.store, args.period, args.min_parts)
@@ -0,0 +1,161 @@
+import json
+import gzip
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON with native NumPy support
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: msgpack responses
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # Optional: brotli compression, gzip otherwise
+    brotli = None
+
+# Encodings of the /stock_data payload. The payload keeps every series as a NumPy array until here,
+# so no format builds one Python object per element unless it has to.
+JSON_MIMETYPE = 'application/json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Bodies smaller than this are sent uncompressed (e.g. error messages)
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def available_mimetypes() -> list:
+    """Get the response formats this server can produce, JSON first as the default."""
+    mimetypes = [JSON_MIMETYPE, ARROW_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    return mimetypes
+
+def dates_to_labels(dates: np.ndarray) -> list:
+    """Format dates as the 'YYYYMMDD' chart labels used by the JSON payload."""
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return pd.DatetimeIndex(dates).strftime('%Y%m%d').tolist()
+    return [str(date) for date in dates]
+
+def dates_to_epoch_ms(dates: np.ndarray) -> np.ndarray:
+    """Convert dates to int64 milliseconds since the epoch, as used by the binary payloads."""
+    if not np.issubdtype(dates.dtype, np.datetime64):
+        dates = pd.to_datetime(pd.Series(dates).astype(str), format='%Y%m%d').to_numpy()
+    return dates.astype('datetime64[ms]').astype(np.int64)
+
+def _json_default(obj):
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _orjson_default(obj):
+    # orjson only serializes C-contiguous arrays natively, e.g. not a column view of a 2-D block
+    if isinstance(obj, np.ndarray):
+        if not obj.flags.c_contiguous:
+            return np.ascontiguousarray(obj)
+        return obj.tolist()  # e.g. object-dtype arrays
+    return _json_default(obj)
+
+def encode_json(payload: dict) -> bytes:
+    """Encode the payload as JSON; with orjson the arrays are serialized natively without .tolist()."""
+    main = dict(payload['main'], x_data=dates_to_labels(payload['main']['x_data']))
+    payload = dict(payload, main=main)
+    if orjson is not None:
+        return orjson.dumps(payload, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_json_default).encode()
+
+def encode_arrow(payload: dict) -> bytes:
+    """
+    Encode the payload as one Arrow IPC record batch with a column per series:
+    'date' (epoch milliseconds), 'open', 'close', 'low', 'high', and '<strategy>.<output>'.
+    Chart configs and strategy errors are stored as JSON in the schema metadata under b'strategies'.
+    """
+    main = payload['main']
+    candles = np.asarray(main['candle_data']).reshape(-1, 4)
+    columns = {'date': dates_to_epoch_ms(main['x_data'])}
+    columns.update({name: candles[:, i] for i, name in enumerate(['open', 'close', 'low', 'high'])})
+
+    strategies = {}
+    for strategy_name, entry in payload['strategies'].items():
+        if 'data' not in entry:
+            strategies[strategy_name] = entry
+            continue
+        strategies[strategy_name] = {'config': entry['config'], 'columns': []}
+        for output_name, values in entry['data'].items():
+            column = f"{strategy_name}.{output_name}"
+            columns[column] = np.asarray(values)
+            strategies[strategy_name]['columns'].append(column)
+
+    batch = pa.RecordBatch.from_pydict(columns, metadata={b'strategies': json.dumps(strategies).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def _typed_array(values) -> dict:
+    values = np.ascontiguousarray(values)
+    return {'dtype': values.dtype.str, 'shape': list(values.shape), 'data': values.tobytes()}
+
+def encode_msgpack(payload: dict) -> bytes:
+    """Encode the payload as msgpack with every series as a typed array {dtype, shape, data}; dates in epoch milliseconds."""
+    main = payload['main']
+    encoded = {
+        'main': {
+            'x_data': _typed_array(dates_to_epoch_ms(main['x_data'])),
+            'candle_data': _typed_array(np.asarray(main['candle_data'])),
+            'close_prices': _typed_array(main['close_prices'])
+        },
+        'strategies': {
+            name: dict(entry, data={output: _typed_array(values) for output, values in entry['data'].items()})
+            if 'data' in entry else entry
+            for name, entry in payload['strategies'].items()
+        }
+    }
+    return msgpack.packb(encoded, use_bin_type=True)
+
+def encode_stock_data(payload: dict, mimetype: str = JSON_MIMETYPE) -> bytes:
+    """
+    Encode a /stock_data payload ({'main': ..., 'strategies': ...} with NumPy arrays) in the given format.
+    :param payload: Output of process_main_stock_data and process_strategy_data.
+    :param mimetype: One of available_mimetypes().
+    :return: Encoded response body.
+    """
+    if mimetype == ARROW_MIMETYPE:
+        return encode_arrow(payload)
+    if mimetype == MSGPACK_MIMETYPE and msgpack is not None:
+        return encode_msgpack(payload)
+    return encode_json(payload)
+
+def stock_data_etag(data_version: str, ts_code: str, params_hashes: dict, **options) -> str:
+    """
+    Tag a /stock_data response by everything it is computed from, so it can be checked before computing it.
+    :param data_version: Version of the loaded dataset (StockDataset.version).
+    :param ts_code: Stock code.
+    :param params_hashes: Strategy names mapped to their params hashes (get_strategy_params_hashes).
+    :param options: Anything else that changes the body, e.g. window, max_points, mimetype and content encoding.
+    :return: Hex digest to use as a strong ETag.
+    """
+    key = json.dumps(
+        {'version': data_version, 'ts_code': ts_code, 'strategies': params_hashes, 'options': options},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def available_encodings() -> list:
+    """Get the content encodings this server can produce, best first."""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with 'br' or 'gzip'; any other encoding returns the body unchanged."""
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
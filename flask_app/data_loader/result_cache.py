@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+from data_loader.single_flight import SingleFlight
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def result_nbytes(result) -> int:
+    """Approximate memory size of a cached strategy result (DataFrame, Series or NumPy array)."""
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    if isinstance(result, pd.Series):
+        return int(result.memory_usage(index=True, deep=True))
+    return int(getattr(result, 'nbytes', 0))
+
+class ResultCache:
+    """
+    Thread-safe in-memory LRU cache of strategy outputs, bounded by their total memory size.
+
+    Keys start with the dataset version id, so a reloaded dataset never hits results of the previous
+    version; those entries are simply evicted as the least recently used. Results are computed outside
+    the lock, so a slow strategy does not block lookups of other keys, and concurrent misses of the same
+    key are coalesced into one computation.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, nbytes), least recently used first
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(data_version, ts_code: str, strategy_name: str, params_hash: str, rows: tuple = None) -> tuple:
+        """
+        Build a cache key.
+        :param data_version: Version id of the dataset the result was computed from.
+        :param ts_code: Stock code.
+        :param strategy_name: Strategy name.
+        :param params_hash: get_params_hash of the adjusted params.
+        :param rows: Positional (start, end) rows of the stock the result was computed over; None for all rows.
+        """
+        return (data_version, ts_code, strategy_name, params_hash, rows)
+
+    def configure(self, max_bytes: int):
+        """Change the size limit, evicting entries if the cache is now over it."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key):
+        """Get a cached result and mark it as recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result):
+        """Cache a result. Results larger than the whole cache are not stored."""
+        nbytes = result_nbytes(result)
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= previous[1]
+            self._entries[key] = (result, nbytes)
+            self._nbytes += nbytes
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        Get a cached result, or compute and cache it. Callers missing the same key at the same time
+        wait for one computation and share its result.
+        A key without a data version (None) is never cached: the data it came from is unknown.
+        :param key: Key from make_key.
+        :param compute: Callable returning the result.
+        :return: The cached or computed result.
+        """
+        if key[0] is None:
+            return compute()
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        def compute_and_put():
+            # The previous computation of this key may have finished between the lookup and now
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            result = compute()
+            self.put(key, result)
+            return result
+
+        return self._flight.do(key, compute_and_put)
+
+    def clear(self):
+        """Drop all entries (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Get the hit/miss/eviction counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'coalesced': self._flight.coalesced,
+                'entries': len(self._entries),
+                'bytes': self._nbytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def _evict(self):
+        # Called with the lock held
+        while self._nbytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self._nbytes -= nbytes
+            self.evictions += 1
+
+# Strategy outputs shared by all requests of a web app process (the strategy monitor computes in its own
+# processes and stores its results in the result store instead)
+strategy_result_cache = ResultCache()
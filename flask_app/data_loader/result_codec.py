@@ -0,0 +1,91 @@
+import json
+import zlib
+import hashlib
+import struct
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # Optional: zstd compression, zlib otherwise
+    zstandard = None
+
+# Binary layout of StrategyResult.result_blob:
+#   1 byte codec ('z' zlib, 's' zstd) + compressed(4-byte header length + JSON header + array bytes)
+# The header lists every output as [name, dtype, length]; the arrays follow in that order, each byte-shuffled
+# (all first bytes of the values, then all second bytes, ...), which lets the compressor find the repeated
+# sign/exponent bytes of neighbouring floats.
+CODEC_ZLIB = b'z'
+CODEC_ZSTD = b's'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+_HEADER_LENGTH = struct.Struct('<I')
+
+def get_config_hash(config: dict) -> str:
+    """Hash a chart config, so identical configs are stored once."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+def _to_array(values, float_dtype: str) -> np.ndarray:
+    values = np.asarray(values)
+    if values.dtype == object:
+        # None marks a missing value in the dict shape
+        values = np.array([np.nan if v is None else v for v in values], dtype='float64')
+    if values.dtype.kind == 'f' and float_dtype:
+        values = values.astype(float_dtype, copy=False)
+    return np.ascontiguousarray(values)
+
+def _shuffle(values: np.ndarray) -> bytes:
+    if values.dtype.itemsize == 1:
+        return values.tobytes()
+    return values.view(np.uint8).reshape(-1, values.dtype.itemsize).T.tobytes()
+
+def _unshuffle(buffer: bytes, dtype: np.dtype, length: int) -> np.ndarray:
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    if dtype.itemsize > 1:
+        raw = raw.reshape(dtype.itemsize, length).T
+    return np.ascontiguousarray(raw).view(dtype).reshape(length)
+
+def encode_series(data: dict, float_dtype: str = 'float64') -> bytes:
+    """
+    Encode the output series of a result ({output name: values}) as compressed typed arrays.
+    :param data: Output names mapped to lists or arrays of values.
+    :param float_dtype: Storage dtype of float outputs, e.g. 'float32' to halve them (lossy).
+    :return: Encoded bytes.
+    """
+    arrays = {name: _to_array(values, float_dtype) for name, values in data.items()}
+    header = json.dumps([[name, values.dtype.str, len(values)] for name, values in arrays.items()]).encode()
+    payload = b''.join([_HEADER_LENGTH.pack(len(header)), header] + [_shuffle(values) for values in arrays.values()])
+
+    if zstandard is not None:
+        return CODEC_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return CODEC_ZLIB + zlib.compress(payload, ZLIB_LEVEL)
+
+def decode_series(blob: bytes) -> dict:
+    """
+    Decode bytes from encode_series.
+    :return: Output names mapped to NumPy arrays.
+    """
+    codec, compressed = blob[:1], blob[1:]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Strategy result is zstd-compressed but the zstandard module is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(compressed)
+    elif codec == CODEC_ZLIB:
+        payload = zlib.decompress(compressed)
+    else:
+        raise ValueError(f"Unknown strategy result codec {codec!r}")
+
+    (header_length,) = _HEADER_LENGTH.unpack_from(payload)
+    offset = _HEADER_LENGTH.size + header_length
+    header = json.loads(payload[_HEADER_LENGTH.size:offset])
+
+    series = {}
+    for name, dtype, length in header:
+        dtype = np.dtype(dtype)
+        size = dtype.itemsize * length
+        series[name] = _unshuffle(payload[offset:offset + size], dtype, length)
+        offset += size
+    return series
+
+def build_result_data(series: dict, config: dict) -> dict:
+    """Rebuild the result_data dict shape ({'data': {output: list}, 'config': ...}) from decoded series."""
+    return {'data': {name: values.tolist() for name, values in series.items()}, 'config': config}
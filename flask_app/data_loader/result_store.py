@@ -0,0 +1,451 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from models import db, read_session, StrategyResult, StrategyConfig
+from config import Config
+
+# Results older than this are not served from the store
+DEFAULT_MAX_AGE = timedelta(hours=24)
+
+class ResultStore(ABC):
+    """
+    Storage backend of strategy results. A result is one (ts_code, strategy_name, params_hash) with its
+    result_data ({'data': {output: values}, 'config': chart config}).
+    Rows passed to save are dicts with ts_code, strategy_name, params_hash and result_data, plus 'dates'
+    (the stock's dates, aligned with the outputs) for backends that store them.
+    """
+
+    # Whether the web app saves the results it computes per request; backends that are written
+    # universe-wide by the strategy monitor only (see ParquetResultStore) turn this off.
+    saves_on_request = True
+
+    @abstractmethod
+    def save(self, rows: list, batch_size: int = None) -> int:
+        """
+        Save results, replacing stored results with the same (ts_code, strategy_name, params_hash).
+
+        Parameters:
+            rows (list): Result rows.
+            batch_size (int): Rows per write batch, where the backend batches.
+
+        Returns:
+            int: Number of rows saved (0 on failure).
+        """
+        pass
+
+    @abstractmethod
+    def get(self, ts_code: str, strategy_name: str, params_hash: str, max_age: timedelta = DEFAULT_MAX_AGE) -> dict:
+        """
+        Get a stored result.
+
+        Returns:
+            dict: result_data, or None if missing or older than max_age.
+        """
+        pass
+
+    @abstractmethod
+    def get_missing(self, ts_codes: list, targets: list) -> list:
+        """
+        Find the combinations that have no stored result.
+
+        Parameters:
+            ts_codes (list): Stock codes.
+            targets (list): (strategy_name, params_hash) pairs.
+
+        Returns:
+            list: Missing (ts_code, strategy_name) pairs.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self) -> int:
+        """
+        Remove all stored results.
+
+        Returns:
+            int: Number of removed entries (results for SQL, partitions for Parquet).
+        """
+        pass
+
+    def compact(self) -> int:
+        """
+        Merge the copies of results written by repeated saves, after the strategy monitor's run.
+        Backends that update results in place have nothing to do.
+
+        Returns:
+            int: Number of compacted entries.
+        """
+        return 0
+
+def _report_rate(action: str, count: int, start_time: float):
+    elapsed = time.perf_counter() - start_time
+    print(f"{action} {count} strategy results in {elapsed:.3f}s ({count / max(elapsed, 1e-9):.0f} rows/s)")
+
+class SqlResultStore(ResultStore):
+    """Results in the strategy_results table (compressed typed arrays, configs in strategy_configs)."""
+
+    @staticmethod
+    def _dialect_insert():
+        """The insert() of the database's dialect, which supports ON CONFLICT."""
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            raise NotImplementedError(f"Bulk upsert is not supported for {dialect}")
+        return insert
+
+    def save(self, rows: list, batch_size: int = None) -> int:
+        """
+        Insert or update results in bulk with INSERT ... ON CONFLICT DO UPDATE on idx_strategy_lookup,
+        executed in batches (executemany) within a single transaction.
+        """
+        if not rows:
+            return 0
+        batch_size = batch_size or Config.RESULT_UPSERT_BATCH_SIZE
+        start_time = time.perf_counter()
+        now = datetime.utcnow()
+
+        try:
+            configs = {}
+            records = []
+            for row in rows:
+                result_blob, config_hash, config = StrategyResult.encode_result_data(row['result_data'])
+                configs.setdefault(config_hash, config)
+                records.append({
+                    'ts_code': row['ts_code'],
+                    'strategy_name': row['strategy_name'],
+                    'params_hash': row['params_hash'],
+                    'result_blob': result_blob,
+                    'config_hash': config_hash,
+                    'created_at': now,
+                    'updated_at': now
+                })
+
+            insert = self._dialect_insert()
+            configs_stmt = insert(StrategyConfig.__table__).on_conflict_do_nothing(index_elements=['config_hash'])
+            results_stmt = insert(StrategyResult.__table__)
+            results_stmt = results_stmt.on_conflict_do_update(
+                index_elements=['ts_code', 'strategy_name', 'params_hash'],
+                set_={column: results_stmt.excluded[column] for column in ['result_blob', 'config_hash', 'updated_at']}
+            )
+
+            db.session.execute(configs_stmt, [{'config_hash': h, 'config': c} for h, c in configs.items()])
+            for i in range(0, len(records), batch_size):
+                db.session.execute(results_stmt, records[i:i + batch_size])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error saving strategy results: {e}")
+            return 0
+
+        _report_rate("Upserted", len(records), start_time)
+        return len(records)
+
+    def get(self, ts_code: str, strategy_name: str, params_hash: str, max_age: timedelta = DEFAULT_MAX_AGE) -> dict:
+        cached = read_session.query(StrategyResult).filter_by(
+            ts_code=ts_code,
+            strategy_name=strategy_name,
+            params_hash=params_hash
+        ).first()
+
+        if cached:
+            if datetime.utcnow() - cached.updated_at < max_age:
+                return cached.result_data
+            # Delete old cache (through the writable session)
+            StrategyResult.query.filter_by(id=cached.id).delete()
+            db.session.commit()
+        return None
+
+    def get_missing(self, ts_codes: list, targets: list) -> list:
+        """
+        One anti-join in the database: the tickers and the targets go into temp tables and only the pairs
+        without a row in strategy_results (looked up via idx_strategy_lookup) come back.
+        """
+        if not ts_codes or not targets:
+            return []
+
+        session = db.session
+        try:
+            session.execute(text('DROP TABLE IF EXISTS missing_check_ts_codes'))
+            session.execute(text('DROP TABLE IF EXISTS missing_check_targets'))
+            session.execute(text('CREATE TEMPORARY TABLE missing_check_ts_codes (ts_code VARCHAR(10) PRIMARY KEY)'))
+            session.execute(text(
+                'CREATE TEMPORARY TABLE missing_check_targets '
+                '(strategy_name VARCHAR(50) PRIMARY KEY, params_hash VARCHAR(64) NOT NULL)'
+            ))
+            session.execute(
+                text('INSERT INTO missing_check_ts_codes (ts_code) VALUES (:ts_code)'),
+                [{'ts_code': ts_code} for ts_code in ts_codes]
+            )
+            session.execute(
+                text('INSERT INTO missing_check_targets (strategy_name, params_hash) VALUES (:strategy_name, :params_hash)'),
+                [{'strategy_name': name, 'params_hash': params_hash} for name, params_hash in targets]
+            )
+
+            return [tuple(row) for row in session.execute(text(
+                'SELECT c.ts_code, t.strategy_name '
+                'FROM missing_check_ts_codes c CROSS JOIN missing_check_targets t '
+                'WHERE NOT EXISTS ('
+                '    SELECT 1 FROM strategy_results r '
+                '    WHERE r.ts_code = c.ts_code AND r.strategy_name = t.strategy_name AND r.params_hash = t.params_hash'
+                ')'
+            ))]
+        finally:
+            session.execute(text('DROP TABLE IF EXISTS missing_check_ts_codes'))
+            session.execute(text('DROP TABLE IF EXISTS missing_check_targets'))
+            session.commit()
+
+    def clear(self) -> int:
+        count = StrategyResult.query.delete()
+        db.session.commit()
+        return count
+
+class ParquetResultStore(ResultStore):
+    """
+    Results as long-format Parquet (ts_code, date, updated_at, one column per output), partitioned
+    hive-style by strategy and params: <root>/strategy=<name>/params_hash=<hash>/part-*.parquet.
+    Each partition also keeps its chart config in _config.json.
+
+    save appends a part file per partition; a result saved again is superseded by its newest copy
+    (latest updated_at) on read. save_partition overwrites a whole partition, e.g. after a universe-wide run,
+    and compact rewrites every partition of several parts as one, keeping the newest copies.
+    Only the strategy monitor writes this store (saves_on_request is off), so the parts of a run are
+    compacted at its end and no partition keeps growing.
+    Universe-wide reads of one indicator are a columnar scan of its partition (see scan).
+    """
+
+    CONFIG_FILE = '_config.json'
+    saves_on_request = False
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def partition_dir(self, strategy_name: str, params_hash: str) -> str:
+        return os.path.join(self.root, f"strategy={strategy_name}", f"params_hash={params_hash}")
+
+    @staticmethod
+    def _to_frame(rows: list, updated_at: pd.Timestamp) -> pd.DataFrame:
+        frames = []
+        for row in rows:
+            dates = row.get('dates')
+            if dates is None:
+                raise ValueError(f"Parquet result store needs the dates of {row['ts_code']} {row['strategy_name']}")
+            dates = pd.Series(dates)
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates.astype(str), format='%Y%m%d')
+
+            columns = {'ts_code': np.full(len(dates), str(row['ts_code']), dtype=object), 'date': dates.to_numpy()}
+            for output_name, values in row['result_data']['data'].items():
+                columns[output_name] = np.asarray(values, dtype='float64')
+            frames.append(pd.DataFrame(columns))
+        df = pd.concat(frames, ignore_index=True)
+        df.insert(2, 'updated_at', updated_at)
+        return df
+
+    def _write_part(self, directory: str, df: pd.DataFrame, config: dict):
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        tmp_path = os.path.join(directory, f".{name}")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path, write_statistics=True)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+        tmp_path = os.path.join(directory, f".{self.CONFIG_FILE}.{uuid.uuid4().hex}")
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f)
+        os.replace(tmp_path, os.path.join(directory, self.CONFIG_FILE))
+
+    def _swap_partition(self, directory: str, df: pd.DataFrame, config: dict):
+        """Replace a partition with one part of df, written next to it and swapped in with renames."""
+        parent, name = os.path.split(directory)
+        new_dir = os.path.join(parent, f".{name}.{uuid.uuid4().hex}")
+        self._write_part(new_dir, df, config)
+
+        old_dir = os.path.join(parent, f".{name}.old.{uuid.uuid4().hex}")
+        if os.path.isdir(directory):
+            os.rename(directory, old_dir)
+        os.rename(new_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def _partition_dirs(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return [
+            os.path.join(self.root, strategy_dir, params_dir)
+            for strategy_dir in os.listdir(self.root) if strategy_dir.startswith('strategy=')
+            for params_dir in os.listdir(os.path.join(self.root, strategy_dir)) if params_dir.startswith('params_hash=')
+        ]
+
+    @staticmethod
+    def _group(rows: list) -> dict:
+        partitions = {}
+        for row in rows:
+            partitions.setdefault((row['strategy_name'], row['params_hash']), []).append(row)
+        return partitions
+
+    def save(self, rows: list, batch_size: int = None) -> int:
+        """Append the rows as one new part file per (strategy, params) partition."""
+        if not rows:
+            return 0
+        start_time = time.perf_counter()
+        updated_at = pd.Timestamp.now('UTC').tz_localize(None)
+        try:
+            for (strategy_name, params_hash), partition_rows in self._group(rows).items():
+                self._write_part(
+                    self.partition_dir(strategy_name, params_hash),
+                    self._to_frame(partition_rows, updated_at),
+                    partition_rows[-1]['result_data'].get('config', {})
+                )
+        except Exception as e:
+            print(f"Error saving strategy results: {e}")
+            return 0
+
+        _report_rate("Appended", len(rows), start_time)
+        return len(rows)
+
+    def save_partition(self, rows: list) -> int:
+        """
+        Overwrite the (strategy, params) partitions of the rows with exactly these rows.
+        The new partition is written next to the old one and swapped in with renames.
+        """
+        if not rows:
+            return 0
+        start_time = time.perf_counter()
+        updated_at = pd.Timestamp.now('UTC').tz_localize(None)
+        for (strategy_name, params_hash), partition_rows in self._group(rows).items():
+            self._swap_partition(
+                self.partition_dir(strategy_name, params_hash),
+                self._to_frame(partition_rows, updated_at),
+                partition_rows[-1]['result_data'].get('config', {})
+            )
+
+        _report_rate("Overwrote partitions with", len(rows), start_time)
+        return len(rows)
+
+    def compact(self) -> int:
+        """
+        Rewrite every partition with more than one part file as a single part holding the newest copy
+        of each result. Not safe against concurrent saves, which is why only the monitor calls it.
+        """
+        start_time = time.perf_counter()
+        compacted = 0
+        for directory in self._partition_dirs():
+            parts = [name for name in os.listdir(directory) if name.startswith('part-')]
+            if len(parts) < 2:
+                continue
+            df = pq.read_table(directory).to_pandas()
+            newest = df.groupby('ts_code', observed=True)['updated_at'].transform('max')
+            df = df[df['updated_at'] == newest].sort_values(['ts_code', 'date'], kind='mergesort')
+            self._swap_partition(directory, df.reset_index(drop=True), self._read_config(directory))
+            compacted += 1
+
+        if compacted:
+            elapsed = time.perf_counter() - start_time
+            print(f"Compacted {compacted} result partitions in {elapsed:.3f}s")
+        return compacted
+
+    def _read_config(self, directory: str) -> dict:
+        try:
+            with open(os.path.join(directory, self.CONFIG_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self, ts_code: str, strategy_name: str, params_hash: str, max_age: timedelta = DEFAULT_MAX_AGE) -> dict:
+        directory = self.partition_dir(strategy_name, params_hash)
+        if not os.path.isdir(directory):
+            return None
+        df = pq.read_table(directory, filters=[('ts_code', '=', ts_code)]).to_pandas()
+        if df.empty:
+            return None
+
+        # The newest copy of the result wins
+        updated_at = df['updated_at'].max()
+        if pd.Timestamp.now('UTC').tz_localize(None) - updated_at >= max_age:
+            return None
+        df = df[df['updated_at'] == updated_at].sort_values('date', kind='mergesort')
+
+        outputs = [c for c in df.columns if c not in ('ts_code', 'date', 'updated_at')]
+        return {'data': {c: df[c].tolist() for c in outputs}, 'config': self._read_config(directory)}
+
+    def get_missing(self, ts_codes: list, targets: list) -> list:
+        """Reads only the ts_code column of each target partition."""
+        missing = []
+        for strategy_name, params_hash in targets:
+            directory = self.partition_dir(strategy_name, params_hash)
+            stored = set()
+            if os.path.isdir(directory):
+                stored = set(pq.read_table(directory, columns=['ts_code']).column('ts_code').unique().to_pylist())
+            missing.extend((ts_code, strategy_name) for ts_code in ts_codes if ts_code not in stored)
+        return missing
+
+    def clear(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        partitions = self._partition_dirs()
+        shutil.rmtree(self.root)
+        return len(partitions)
+
+    def scan(self, strategy_name: str, params_hash: str = None, columns: list = None, ts_codes: list = None,
+             start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Read one indicator for the whole universe (or some stocks) as a long DataFrame.
+        :param strategy_name: Strategy name.
+        :param params_hash: Only this params partition; all params (as a 'params_hash' column) if omitted.
+        :param columns: Output columns to read (ts_code, date and params_hash are always included).
+        :param ts_codes: Only these stocks.
+        :param start_date: First date to include.
+        :param end_date: Last date to include.
+        :return: DataFrame of the newest copy of every result, sorted by ts_code and date.
+        """
+        directory = os.path.join(self.root, f"strategy={strategy_name}")
+        if params_hash is not None:
+            directory = self.partition_dir(strategy_name, params_hash)
+        if not os.path.isdir(directory):
+            return pd.DataFrame()
+
+        filters = []
+        if ts_codes is not None:
+            filters.append(('ts_code', 'in', list(ts_codes)))
+        if start_date is not None:
+            filters.append(('date', '>=', pd.Timestamp(start_date)))
+        if end_date is not None:
+            filters.append(('date', '<=', pd.Timestamp(end_date)))
+        if columns is not None:
+            columns = ['ts_code', 'date', 'updated_at'] + list(columns)
+            if params_hash is None:
+                columns.append('params_hash')
+
+        df = pq.read_table(directory, columns=columns, filters=filters or None, partitioning='hive').to_pandas()
+        if df.empty:
+            return df
+
+        # Keep the newest copy of every (ts_code, params) result
+        keys = ['ts_code'] + (['params_hash'] if 'params_hash' in df.columns else [])
+        newest = df.groupby(keys, observed=True)['updated_at'].transform('max')
+        df = df[df['updated_at'] == newest].drop(columns='updated_at')
+        return df.sort_values(keys + ['date'], kind='mergesort').reset_index(drop=True)
+
+_result_stores = {}
+
+def get_result_store() -> ResultStore:
+    """Get the result store selected by Config.RESULT_STORE ('sql' or 'parquet')."""
+    key = (Config.RESULT_STORE, Config.RESULT_STORE_PATH)
+    if key not in _result_stores:
+        if Config.RESULT_STORE == 'sql':
+            _result_stores[key] = SqlResultStore()
+        elif Config.RESULT_STORE == 'parquet':
+            _result_stores[key] = ParquetResultStore(Config.RESULT_STORE_PATH)
+        else:
+            raise ValueError(f"Unknown result store {Config.RESULT_STORE}")
+    return _result_stores[key]
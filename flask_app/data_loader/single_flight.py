@@ -0,0 +1,51 @@
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical computations: while a computation for a key is in progress,
+    other callers with the same key wait for it and share its result (or its exception)
+    instead of running their own. Nothing is kept once the computation finishes; caching is up to the caller.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0  # Calls that waited for another caller's computation
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the computation of key that is already in progress.
+        :param key: Hashable identity of the computation.
+        :param fn: Callable computing the result.
+        :return: The result of the (shared) computation.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,102 @@
+"""Store strategy result data as compressed typed arrays with shared configs
+
+Revision ID: 5b7e2c9a41f3
+Revises: d0d7828f1334
+Create Date: 2026-10-18 10:12:47.180114
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from data_loader.result_codec import encode_series, decode_series, build_result_data, get_config_hash
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9a41f3'
+down_revision = 'd0d7828f1334'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _load_json(value):
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _batches(conn, columns):
+    """Page through strategy_results by id, so only one batch of rows is held in memory at a time."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text(f'SELECT id, {columns} FROM strategy_results WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        ).fetchall()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.create_table('strategy_configs',
+    sa.Column('config_hash', sa.String(length=64), nullable=False),
+    sa.Column('config', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('config_hash')
+    )
+    with op.batch_alter_table('strategy_results') as batch_op:
+        batch_op.add_column(sa.Column('result_blob', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('config_hash', sa.String(length=64), nullable=True))
+
+    # Convert the JSON results in batches, storing every distinct config once
+    conn = op.get_bind()
+    configs = {}
+    for rows in _batches(conn, 'result_data'):
+        updates = []
+        for row_id, result_data in rows:
+            result_data = _load_json(result_data)
+            config = result_data.get('config', {})
+            config_hash = get_config_hash(config)
+            configs.setdefault(config_hash, config)
+            updates.append({'id': row_id, 'blob': encode_series(result_data['data']), 'hash': config_hash})
+        conn.execute(
+            sa.text('UPDATE strategy_results SET result_blob = :blob, config_hash = :hash WHERE id = :id'),
+            updates
+        )
+    if configs:
+        conn.execute(
+            sa.text('INSERT INTO strategy_configs (config_hash, config) VALUES (:hash, :config)'),
+            [{'hash': config_hash, 'config': json.dumps(config)} for config_hash, config in configs.items()]
+        )
+
+    with op.batch_alter_table('strategy_results') as batch_op:
+        batch_op.alter_column('result_blob', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.alter_column('config_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_foreign_key(
+            'fk_strategy_results_config_hash', 'strategy_configs', ['config_hash'], ['config_hash']
+        )
+        batch_op.drop_column('result_data')
+
+
+def downgrade():
+    with op.batch_alter_table('strategy_results') as batch_op:
+        batch_op.add_column(sa.Column('result_data', sa.JSON(), nullable=True))
+
+    conn = op.get_bind()
+    configs = {
+        config_hash: _load_json(config)
+        for config_hash, config in conn.execute(sa.text('SELECT config_hash, config FROM strategy_configs'))
+    }
+    for rows in _batches(conn, 'result_blob, config_hash'):
+        updates = [
+            {'id': row_id, 'data': json.dumps(build_result_data(decode_series(blob), configs.get(config_hash, {})))}
+            for row_id, blob, config_hash in rows
+        ]
+        conn.execute(sa.text('UPDATE strategy_results SET result_data = :data WHERE id = :id'), updates)
+
+    with op.batch_alter_table('strategy_results') as batch_op:
+        batch_op.alter_column('result_data', existing_type=sa.JSON(), nullable=False)
+        batch_op.drop_constraint('fk_strategy_results_config_hash', type_='foreignkey')
+        batch_op.drop_column('config_hash')
+        batch_op.drop_column('result_blob')
+    op.drop_table('strategy_configs')
@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, event, orm
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from datetime import datetime
+from config import Config
+from data_loader.result_codec import encode_series, decode_series, build_result_data, get_config_hash
 
 # Initialize the SQLAlchemy instance
 db = SQLAlchemy()
@@ -24,6 +27,16 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class StrategyConfig(db.Model):
+    """Chart config of strategy results, stored once and shared by all results with the same config."""
+    __tablename__ = 'strategy_configs'
+
+    config_hash = db.Column(db.String(64), primary_key=True)  # get_config_hash of the config
+    config = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+        return f'<StrategyConfig {self.config_hash[:8]}>'
+
 class StrategyResult(db.Model):
     """Model for storing strategy calculation results."""
     __tablename__ = 'strategy_results'
@@ -32,7 +45,9 @@ class StrategyResult(db.Model):
     ts_code = db.Column(db.String(10), nullable=False)
     strategy_name = db.Column(db.String(50), nullable=False)
     params_hash = db.Column(db.String(64), nullable=False)  # Hash of strategy parameters
-    result_data = db.Column(db.JSON, nullable=False)  # Store strategy results as JSON
+    result_blob = db.Column(db.LargeBinary, nullable=False)  # Output series as compressed typed arrays (result_codec)
+    config_hash = db.Column(db.String(64), db.ForeignKey('strategy_configs.config_hash'), nullable=False)
+    config_entry = db.relationship('StrategyConfig', lazy='joined')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -40,9 +55,73 @@ class StrategyResult(db.Model):
         db.Index('idx_strategy_lookup', 'ts_code', 'strategy_name', 'params_hash', unique=True),
     )
 
+    @property
+    def result_data(self) -> dict:
+        """The result as {'data': {output: list of values}, 'config': chart config}."""
+        config = self.config_entry.config if self.config_entry is not None else {}
+        return build_result_data(decode_series(self.result_blob), config)
+
+    @staticmethod
+    def encode_result_data(result_data: dict) -> tuple:
+        """Encode a result dict for storage: (result_blob, config_hash, config). Written by upsert_strategy_results."""
+        config = result_data.get('config', {})
+        return encode_series(result_data['data'], Config.RESULT_FLOAT_DTYPE), get_config_hash(config), config
+
     def __repr__(self):
         return f'<StrategyResult {self.strategy_name} for {self.ts_code}>'
 
+# Session for request handlers that only read, on a read-only engine of the same database (see configure_engines).
+# With WAL its readers never wait for the strategy monitor's writes.
+# Scoped like Flask-SQLAlchemy's db.session: per greenlet if greenlet is available, per thread otherwise.
+try:
+    from greenlet import getcurrent as _ident_func
+except ImportError:
+    from threading import get_ident as _ident_func
+
+read_session = orm.scoped_session(orm.sessionmaker(), scopefunc=_ident_func)
+
+def _set_sqlite_pragmas(pragmas: dict):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return on_connect
+
+def configure_engines(app, read_only: bool = True):
+    """
+    Apply app.config['SQLITE_PRAGMAS'] to every new SQLite connection and bind read_session to a read-only
+    engine of the same database. Call after db.init_app(app), before the first query.
+    :param app: Flask app.
+    :param read_only: Bind read_session to a read-only engine; writers such as the strategy monitor
+                      bind it to the writable engine.
+    """
+    @app.teardown_appcontext
+    def remove_read_session(exception=None):
+        read_session.remove()
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            read_session.configure(bind=engine)
+            return
+
+        pragmas = app.config.get('SQLITE_PRAGMAS', {})
+        event.listen(engine, 'connect', _set_sqlite_pragmas(pragmas))
+        if not read_only:
+            read_session.configure(bind=engine)
+            return
+
+        # WAL is stored in the database file, so switch it with a writable connection before any reader opens
+        engine.connect().close()
+        read_engine = create_engine(
+            f"sqlite:///file:{engine.url.database}?mode=ro&uri=true",
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        )
+        read_pragmas = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+        event.listen(read_engine, 'connect', _set_sqlite_pragmas(read_pragmas))
+        read_session.configure(bind=read_engine)
+
 # Initialize database (create tables)
 def init_db(app):
     with app.app_context():
@@ -1,16 +1,19 @@
 import pandas as pd
 from abc import ABC, abstractmethod
+from strategies.EvaluationContext import EvaluationContext
 
 class BaseStrategy(ABC):
     """Base interface for all trading strategies."""
 
     @abstractmethod
-    def calculate(self, data: pd.DataFrame, **params):
+    def calculate(self, data: pd.DataFrame, context: EvaluationContext = None, **params):
         """
         Calculate the strategy's result.
         
         Parameters:
             data (DataFrame): Stock data with 'open', 'close', 'high', 'low', etc.
+            context (EvaluationContext): Optional cache of intermediates built on `data`,
+                                         shared by all strategies evaluated on the same stock.
             **params: Additional parameters specific to the strategy.
             
         Returns:
@@ -39,6 +42,100 @@ class BaseStrategy(ABC):
         """
         pass
 
+    def calculate_grid(self, data: pd.DataFrame, param_sets: list, context: EvaluationContext = None):
+        """
+        Calculate the strategy for several parameter sets on the same data.
+        The default shares one EvaluationContext across all sets; strategies can override
+        this to share more work (e.g. one cumulative sum for every window length).
+        
+        Parameters:
+            data (DataFrame): Stock data with 'open', 'close', 'high', 'low', etc.
+            param_sets (list): Complete parameter dictionaries.
+            context (EvaluationContext): Optional cache of intermediates built on `data`.
+            
+        Returns:
+            list: One result DataFrame per parameter set, in the same order.
+        """
+        context = context or EvaluationContext(data)
+        return [self.calculate(data, context=context, **params) for params in param_sets]
+
+    def get_lookback(self, **params):
+        """
+        Get the warm-up the strategy needs: how many bars before a window must be included in the input
+        so its outputs inside the window match a calculation over the full history.
+        
+        Parameters:
+            **params: Parameters specific to the strategy (complete, as passed to calculate).
+            
+        Returns:
+            int or None: Number of warm-up bars, or None if every output depends on the full history.
+        """
+        return None
+
+    def supports_panel(self):
+        """
+        Identify whether the strategy can run in panel mode.
+        Strategies that do all window work through the EvaluationContext can return True.
+        
+        Returns:
+            bool: True if the strategy can run over all stocks in one pass.
+        """
+        return False
+
+    def calculate_panel(self, panel: pd.DataFrame, **params):
+        """
+        Calculate the strategy's result for all stocks in one vectorized pass.
+        Runs calculate with a context grouped by ts_code, so rolling/ewm windows never cross
+        stocks and each stock gets the same values as calling calculate on it alone.
+        
+        Parameters:
+            panel (DataFrame): All stocks sorted by ('ts_code', 'date'), with a 'ts_code' column
+                               and float 'open', 'close', 'high', 'low', 'vol', 'amount' columns.
+            **params: Additional parameters specific to the strategy.
+            
+        Returns:
+            DataFrame: Output columns row-aligned with the panel.
+        """
+        if not self.supports_panel():
+            raise NotImplementedError(f"Strategy {self.name()} does not support panel mode.")
+        return self.calculate(panel, context=EvaluationContext(panel, by='ts_code'), **params)
+
+    def supports_incremental(self):
+        """
+        Identify whether the strategy implements init_state/update.
+        
+        Returns:
+            bool: True if the strategy can be advanced one bar at a time.
+        """
+        return False
+
+    def init_state(self, history: pd.DataFrame, **params):
+        """
+        Build the incremental state from a stock's history.
+        
+        Parameters:
+            history (DataFrame): One stock's float 'open', 'close', 'high', 'low', 'vol', 'amount'
+                                 columns in date order (may be empty).
+            **params: Additional parameters specific to the strategy.
+            
+        Returns:
+            dict: Opaque, picklable state to pass to update.
+        """
+        raise NotImplementedError(f"Strategy {self.name()} does not support incremental updates.")
+
+    def update(self, state: dict, bar):
+        """
+        Advance the state by one new bar in O(1).
+        
+        Parameters:
+            state (dict): State from init_state, updated in place.
+            bar (dict or Series): The new bar with 'open', 'close', 'high', 'low', 'vol', 'amount'.
+            
+        Returns:
+            dict: Output name -> value for the new bar, matching the columns of calculate.
+        """
+        raise NotImplementedError(f"Strategy {self.name()} does not support incremental updates.")
+
     def get_config(self):
         """
         Get the configuration for the strategy's outputs.
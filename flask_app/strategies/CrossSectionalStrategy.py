@@ -0,0 +1,65 @@
+import pandas as pd
+from abc import abstractmethod
+from strategies.BaseStrategy import BaseStrategy
+
+class CrossSectionalStrategy(BaseStrategy):
+    """
+    Base class for cross-based strategies that transform one column across all stocks on each date.
+    The date grouping is a single vectorized groupby; subclasses only implement cross_section().
+    """
+
+    def calculate(self, df: pd.DataFrame, column: str = "close", **params):
+        """
+        Apply the cross-sectional operator to a column for every date.
+
+        Args:
+            df: DataFrame containing all stocks data with MultiIndex [ts_code, date]
+            column: Column name to apply the operator to
+            **params: Additional parameters passed to cross_section
+
+        Returns:
+            DataFrame with the output_name() column, indexed like df
+        """
+        # Ensure the column exists
+        if column not in df.columns:
+            raise ValueError(f"Column {column} not found in DataFrame")
+
+        grouped = df[column].groupby(self.get_dates(df), sort=False)
+        result = self.cross_section(grouped, **params)
+        return pd.DataFrame({self.output_name(): result}, index=df.index)
+
+    @staticmethod
+    def get_dates(df: pd.DataFrame):
+        """Get the per-row date key from the MultiIndex, or from the 'date' column as a fallback."""
+        if isinstance(df.index, pd.MultiIndex) and 'date' in df.index.names:
+            return df.index.get_level_values('date')
+        if 'date' in df.columns:
+            return df['date'].to_numpy()
+        raise ValueError("No date information found in DataFrame")
+
+    @abstractmethod
+    def cross_section(self, grouped, **params):
+        """
+        Compute the operator for every date at once.
+
+        Args:
+            grouped: SeriesGroupBy of the input column grouped by date
+            **params: Additional parameters specific to the strategy
+
+        Returns:
+            Series aligned with the input rows
+        """
+        pass
+
+    @abstractmethod
+    def output_name(self):
+        """Get the name of the output column."""
+        pass
+
+    def get_lookback(self, **params):
+        """Each date only depends on the other stocks on that date, so no warm-up is needed."""
+        return 0
+
+    def is_self_based(self):
+        """Cross-sectional strategies require data from all stocks for comparison."""
+        return False
@@ -0,0 +1,89 @@
+import pandas as pd
+from strategies.Kernels import (group_rolling, group_ewm_mean, group_diff, group_shift, rolling_argmax, rolling_argmin,
+                               prefix_sums, rolling_mean_from_prefix)
+
+class EvaluationContext:
+    """
+    Memoizes named intermediates (rolling means, EMAs, diffs, ...) of one input frame,
+    so strategies evaluated on the same stock compute each primitive only once.
+
+    With `by` set (e.g. 'ts_code' on a panel) every window op is group-aware.
+    Cached Series are shared between strategies and must not be modified in place.
+    """
+
+    def __init__(self, data: pd.DataFrame, by=None):
+        self.data = data
+        self.by = data[by] if isinstance(by, str) else by
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, compute):
+        """Return the cached value for key, computing and storing it on the first request."""
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        value = compute()
+        self._cache[key] = value
+        return value
+
+    def rolling(self, column: str, window: int, func: str = 'mean', min_periods: int = None) -> pd.Series:
+        """Rolling aggregation of a column, e.g. rolling('close', 20) for the 20-day mean."""
+        return self.get(
+            ('rolling', column, window, func, min_periods),
+            lambda: group_rolling(self.data[column], window, func, by=self.by, min_periods=min_periods)
+        )
+
+    def rolling_mean(self, column: str, window: int, min_periods: int = None) -> pd.Series:
+        return self.rolling(column, window, 'mean', min_periods)
+
+    def rolling_max(self, column: str, window: int) -> pd.Series:
+        return self.rolling(column, window, 'max')
+
+    def rolling_min(self, column: str, window: int) -> pd.Series:
+        return self.rolling(column, window, 'min')
+
+    def rolling_argmax(self, column: str, window: int) -> pd.Series:
+        """Row position of the first maximum of a column in each trailing window."""
+        return self.get(
+            ('rolling_argmax', column, window),
+            lambda: rolling_argmax(self.data[column], window, by=self.by)
+        )
+
+    def rolling_argmin(self, column: str, window: int) -> pd.Series:
+        """Row position of the first minimum of a column in each trailing window."""
+        return self.get(
+            ('rolling_argmin', column, window),
+            lambda: rolling_argmin(self.data[column], window, by=self.by)
+        )
+
+    def ewm(self, column: str, span: int) -> pd.Series:
+        """Exponential moving average (adjust=False) of a column."""
+        return self.get(('ewm', column, span), lambda: group_ewm_mean(self.data[column], span, by=self.by))
+
+    def diff(self, column: str, periods: int = 1) -> pd.Series:
+        return self.get(('diff', column, periods), lambda: group_diff(self.data[column], periods, by=self.by))
+
+    def shift(self, column: str, periods: int = 1) -> pd.Series:
+        return self.get(('shift', column, periods), lambda: group_shift(self.data[column], periods, by=self.by))
+
+    def group_positions(self):
+        """Row position of each row within its group, None without grouping."""
+        if self.by is None:
+            return None
+        return self.get(('group_positions',), lambda: self.by.groupby(self.by, sort=False, observed=True).cumcount().to_numpy())
+
+    def prefix_sums(self, column: str):
+        """Padded cumulative sums of a column, see Kernels.prefix_sums."""
+        return self.get(('prefix_sums', column), lambda: prefix_sums(self.data[column]))
+
+    def rolling_mean_prefix(self, column: str, window: int) -> pd.Series:
+        """
+        rolling_mean(column, window) derived from the shared prefix sums, so many window lengths
+        cost one cumulative sum plus one subtraction each. Equal to rolling_mean up to float rounding.
+        """
+        return self.get(
+            ('rolling_mean_prefix', column, window),
+            lambda: rolling_mean_from_prefix(self.prefix_sums(column), window, self.data.index, self.group_positions())
+        )
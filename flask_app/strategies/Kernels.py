@@ -0,0 +1,236 @@
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# Vectorized numeric kernels shared by strategies.
+# Every kernel takes an optional `by` group key (e.g. the panel's ts_code column). With `by`
+# the window never crosses a group boundary, so one call over the whole (ts_code, date) panel
+# gives the same values as calling it once per stock.
+
+def _ungroup(result: pd.Series, index: pd.Index) -> pd.Series:
+    """Drop the group level added by groupby window ops and restore the input row order."""
+    result = result.droplevel(0)
+    if not result.index.equals(index):
+        result = result.reindex(index)
+    return result
+
+def group_rolling(series: pd.Series, window: int, func: str = 'mean', by=None, min_periods: int = None) -> pd.Series:
+    """Rolling aggregation ('mean', 'sum', 'max', 'min', ...) within each group."""
+    if by is None:
+        return getattr(series.rolling(window=window, min_periods=min_periods), func)()
+    rolling = series.groupby(by, sort=False, observed=True).rolling(window=window, min_periods=min_periods)
+    return _ungroup(getattr(rolling, func)(), series.index)
+
+def group_ewm_mean(series: pd.Series, span: int, by=None) -> pd.Series:
+    """Exponential moving average (adjust=False) within each group."""
+    if by is None:
+        return series.ewm(span=span, adjust=False).mean()
+    ewm = series.groupby(by, sort=False, observed=True).ewm(span=span, adjust=False)
+    return _ungroup(ewm.mean(), series.index)
+
+def group_diff(series: pd.Series, periods: int = 1, by=None) -> pd.Series:
+    """First discrete difference within each group."""
+    if by is None:
+        return series.diff(periods)
+    return series.groupby(by, sort=False, observed=True).diff(periods)
+
+def group_shift(series: pd.Series, periods: int = 1, by=None) -> pd.Series:
+    """Shift values within each group."""
+    if by is None:
+        return series.shift(periods)
+    return series.groupby(by, sort=False, observed=True).shift(periods)
+
+def group_fill(series: pd.Series, by=None) -> pd.Series:
+    """Back-fill then forward-fill missing values within each group."""
+    if by is None:
+        return series.bfill().ffill()
+    grouped = series.groupby(by, sort=False, observed=True)
+    filled = grouped.bfill()
+    return filled.groupby(by, sort=False, observed=True).ffill()
+
+def _rolling_arg_extreme(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Position of the first maximum in each trailing window, in O(n).
+    Uses the van Herk/Gil-Werman scheme: split the array into blocks of `window`, take
+    running prefix and suffix arg-maxima inside each block, then every window is one
+    suffix (from its start to the block end) plus one prefix (up to its end) of the next block.
+    Windows containing NaN, and the first window - 1 rows, are NaN.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    isnan = np.isnan(values)
+    x = np.where(isnan, -np.inf, values)
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, -np.inf)
+    padded[:n] = x
+    blocks = padded.reshape(n_blocks, window)
+    positions = np.arange(n_blocks * window).reshape(n_blocks, window)
+    head = np.full((n_blocks, 1), -np.inf)
+
+    # Prefix: a strictly greater value starts a new maximum, so ties keep the earliest position
+    prefix_max = np.maximum.accumulate(blocks, axis=1)
+    is_new = blocks > np.hstack((head, prefix_max[:, :-1]))
+    is_new[:, 0] = True
+    prefix_pos = np.maximum.accumulate(np.where(is_new, positions, -1), axis=1).ravel()
+    prefix_max = prefix_max.ravel()
+
+    # Suffix: scan each block backwards, ties move the maximum to the earlier position
+    rev_blocks = blocks[:, ::-1]
+    rev_positions = positions[:, ::-1]
+    suffix_max = np.maximum.accumulate(rev_blocks, axis=1)
+    is_new = rev_blocks >= np.hstack((head, suffix_max[:, :-1]))
+    is_new[:, 0] = True
+    suffix_pos = np.minimum.accumulate(np.where(is_new, rev_positions, len(padded)), axis=1)
+    suffix_max = suffix_max[:, ::-1].ravel()
+    suffix_pos = suffix_pos[:, ::-1].ravel()
+
+    ends = np.arange(window - 1, n)
+    starts = ends - window + 1
+    take_left = suffix_max[starts] >= prefix_max[ends]
+    out[ends] = np.where(take_left, suffix_pos[starts], prefix_pos[ends])
+
+    # Match rolling(window) semantics: any NaN in the window gives NaN
+    nan_count = np.concatenate(([0], np.cumsum(isnan)))
+    out[ends[nan_count[ends + 1] - nan_count[starts] > 0]] = np.nan
+    return out
+
+def _rolling_arg(series: pd.Series, window: int, by, sign: float) -> pd.Series:
+    positions = _rolling_arg_extreme(sign * series.to_numpy(dtype=float), window)
+    if by is not None:
+        # Windows that start before the group's first row cross a group boundary
+        group_pos = series.groupby(by, sort=False, observed=True).cumcount().to_numpy()
+        positions[group_pos < window - 1] = np.nan
+    return pd.Series(positions, index=series.index)
+
+def rolling_argmax(series: pd.Series, window: int, by=None) -> pd.Series:
+    """
+    Row position (0-based, within the series) of the first maximum in each trailing window.
+    Same result as rolling(window).apply(lambda x: x.idxmax()) on a RangeIndex, at O(n) cost.
+    """
+    return _rolling_arg(series, window, by, 1.0)
+
+def rolling_argmin(series: pd.Series, window: int, by=None) -> pd.Series:
+    """Row position of the first minimum in each trailing window, see rolling_argmax."""
+    return _rolling_arg(series, window, by, -1.0)
+
+# Streaming kernels for incremental updates: each push is O(1) (amortized), and the
+# outputs match the vectorized rolling ops above on the same sequence of values.
+
+class RollingWindow:
+    """Fixed-size trailing window with a running sum, like rolling(size).mean()."""
+
+    def __init__(self, size: int, values=()):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.nan_count = 0
+        self._pushes = 0
+        for value in list(values)[-size:]:
+            self.push(value)
+
+    def push(self, value: float):
+        if len(self.values) == self.size:
+            oldest = self.values[0]
+            if math.isnan(oldest):
+                self.nan_count -= 1
+            else:
+                self.total -= oldest
+        self.values.append(value)
+        if math.isnan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+
+        # Re-sum once per window length so floating-point drift stays bounded (amortized O(1))
+        self._pushes += 1
+        if self._pushes >= self.size:
+            self.total = float(sum(v for v in self.values if not math.isnan(v)))
+            self._pushes = 0
+
+    def is_full(self) -> bool:
+        return len(self.values) == self.size
+
+    def mean(self) -> float:
+        """Mean of the window, NaN until it is full or while it contains NaN."""
+        if not self.is_full() or self.nan_count:
+            return float('nan')
+        return self.total / self.size
+
+class RollingExtreme:
+    """
+    Trailing-window maximum (or minimum) and the position of its first occurrence,
+    kept in a monotonic deque. Positions count pushes from `start`.
+    """
+
+    def __init__(self, size: int, find_max: bool = True, values=(), start: int = 0):
+        self.size = size
+        self.sign = 1.0 if find_max else -1.0
+        self.items = deque()  # (position, signed value), values strictly decreasing
+        self.position = start - 1
+        self.last_nan = None
+        for value in values:
+            self.push(value)
+
+    def push(self, value: float):
+        self.position += 1
+        if math.isnan(value):
+            self.last_nan = self.position
+        else:
+            signed = self.sign * value
+            # Equal values stay queued so the front is the earliest extreme
+            while self.items and self.items[-1][1] < signed:
+                self.items.pop()
+            self.items.append((self.position, signed))
+        while self.items and self.items[0][0] <= self.position - self.size:
+            self.items.popleft()
+
+    def is_valid(self) -> bool:
+        """True once a full window without NaN has been seen, like rolling(size) with min_periods=size."""
+        has_nan = self.last_nan is not None and self.position - self.last_nan < self.size
+        return len(self.items) > 0 and self.position >= self.size - 1 and not has_nan
+
+    def value(self) -> float:
+        return self.sign * self.items[0][1] if self.is_valid() else float('nan')
+
+    def arg(self) -> float:
+        """Position of the first extreme in the window, NaN if the window is not valid."""
+        return self.items[0][0] if self.is_valid() else float('nan')
+
+def ewm_step(previous: float, value: float, alpha: float) -> float:
+    """One step of ewm(adjust=False).mean(), in the same arithmetic order as pandas."""
+    if previous is None or math.isnan(previous):
+        return value
+    if math.isnan(value):
+        return previous
+    return ((1 - alpha) * previous + alpha * value) / ((1 - alpha) + alpha)
+
+def prefix_sums(series: pd.Series):
+    """
+    Cumulative sums padded with a leading 0: of the values (NaN counted as 0) and of the NaN count.
+    Any window sum is then prefix[end + 1] - prefix[start], so one pass serves every window length.
+    """
+    values = series.to_numpy(dtype=float)
+    isnan = np.isnan(values)
+    value_sums = np.concatenate(([0.0], np.cumsum(np.where(isnan, 0.0, values))))
+    nan_counts = np.concatenate(([0], np.cumsum(isnan)))
+    return value_sums, nan_counts
+
+def rolling_mean_from_prefix(prefix: tuple, window: int, index: pd.Index, group_pos: np.ndarray = None) -> pd.Series:
+    """
+    rolling(window).mean() from prefix_sums in O(n): NaN during warm-up and for windows with NaN.
+    Pass the in-group row positions (groupby().cumcount()) to keep windows inside each group.
+    """
+    value_sums, nan_counts = prefix
+    n = len(value_sums) - 1
+    out = np.full(n, np.nan)
+    if 1 <= window <= n:
+        ends = np.arange(window, n + 1)
+        means = (value_sums[ends] - value_sums[ends - window]) / window
+        out[window - 1:] = np.where(nan_counts[ends] - nan_counts[ends - window] > 0, np.nan, means)
+    if group_pos is not None:
+        out[group_pos < window - 1] = np.nan
+    return pd.Series(out, index=index)
@@ -1,19 +1,30 @@
 import inspect
+import hashlib
+import json
+import pandas as pd
 from strategies.TechnicalStrategies import *  # Import all strategies dynamically
 import strategies.TechnicalStrategies as TechnicalStrategies
 from strategies.BaseStrategy import BaseStrategy
+from strategies.EvaluationContext import EvaluationContext
+
+def get_params_hash(params: dict) -> str:
+    """Create a hash of strategy parameters for caching."""
+    # Sort the params to ensure consistent hashing
+    sorted_params = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(sorted_params.encode()).hexdigest()
 
 class StrategyManager:
     """StrategyManager class that loads and manages different stock strategies."""
     
     _strategies = {}
+    NUMERICAL_COLUMNS = ['open', 'high', 'low', 'close', 'vol', 'amount']
 
     @classmethod
     def _load_strategies(cls):
         """Automatically load all strategies defined in the TechnicalStrategies module."""
         for name, obj in inspect.getmembers(TechnicalStrategies):
-            # Check if the object is a class and is a subclass of BaseStrategy
-            if inspect.isclass(obj) and issubclass(obj, BaseStrategy) and obj != BaseStrategy:
+            # Check if the object is a concrete subclass of BaseStrategy (skips abstract bases)
+            if inspect.isclass(obj) and issubclass(obj, BaseStrategy) and not inspect.isabstract(obj):
                 strategy_instance = obj()  # Create an instance of the strategy class
                 cls._strategies[strategy_instance.name()] = strategy_instance
         # print(cls._strategies)
@@ -31,3 +42,87 @@ class StrategyManager:
         if not cls._strategies:
             cls._load_strategies()  # Load strategies when needed
         return list(cls._strategies.keys())
+
+    @staticmethod
+    def adjust_params(strategy: BaseStrategy, params: dict) -> dict:
+        """Fill a (possibly partial) user parameter dict with the strategy's defaults."""
+        return {param: params.get(param, default) for param, default in strategy.get_input_parameters().items()}
+
+    @classmethod
+    def calculate_grid(cls, name: str, data: pd.DataFrame, param_sets: list, context: EvaluationContext = None) -> dict:
+        """
+        Calculate one strategy for a grid of parameter sets, sharing intermediates between them.
+        
+        :param name: Strategy name.
+        :param data: Stock data with float numerical columns.
+        :param param_sets: List of (possibly partial) parameter dicts; defaults fill the gaps.
+        :param context: Optional EvaluationContext built on data, e.g. shared with other strategies.
+        :return: Dictionary mapping get_params_hash(adjusted params) to the result DataFrame.
+        """
+        strategy = cls.get_strategy(name)
+        if not strategy:
+            raise ValueError(f"Strategy {name} not found.")
+
+        # Identical parameter sets are calculated once
+        unique_params = {}
+        for params in param_sets:
+            adjusted_params = cls.adjust_params(strategy, params)
+            unique_params.setdefault(get_params_hash(adjusted_params), adjusted_params)
+
+        results = strategy.calculate_grid(data, list(unique_params.values()), context=context)
+        return dict(zip(unique_params.keys(), results))
+
+    @classmethod
+    def incremental_strategies(cls) -> list:
+        """Get all strategies that support init_state/update."""
+        if not cls._strategies:
+            cls._load_strategies()  # Load strategies when needed
+        return [strategy for strategy in cls._strategies.values() if strategy.supports_incremental()]
+
+    @classmethod
+    def init_states(cls, dataset, strategy_names: list = None) -> dict:
+        """
+        Build incremental states with default parameters for every ticker of a StockDataset.
+        
+        :param dataset: StockDataset with the full history.
+        :param strategy_names: Strategies to include (default: all incremental strategies).
+        :return: Dictionary {ts_code: {strategy_name: state}}.
+        """
+        states = {}
+        for ts_code in dataset.ts_codes():
+            history = dataset.get(ts_code)[cls.NUMERICAL_COLUMNS].astype(float)
+            states[ts_code] = cls._init_stock_states(history, strategy_names)
+        return states
+
+    @classmethod
+    def _init_stock_states(cls, history, strategy_names: list = None) -> dict:
+        return {
+            strategy.name(): strategy.init_state(history, **strategy.get_input_parameters())
+            for strategy in cls.incremental_strategies()
+            if strategy_names is None or strategy.name() in strategy_names
+        }
+
+    @classmethod
+    def update_states(cls, states: dict, bars) -> dict:
+        """
+        Advance all states by a batch of new bars for many tickers (e.g. the end-of-day refresh).
+        Each ticker's bars are applied in date order; tickers without a state (new listings)
+        start from an empty history.
+        
+        :param states: Dictionary from init_states, updated in place.
+        :param bars: DataFrame with 'ts_code', 'date' and the numerical columns.
+        :return: Dictionary {ts_code: {strategy_name: {output_name: [one value per new bar]}}}.
+        """
+        outputs = {}
+        empty_history = pd.DataFrame({column: pd.Series(dtype=float) for column in cls.NUMERICAL_COLUMNS})
+        bars = bars.sort_values(['ts_code', 'date'], kind='mergesort')
+        for bar in bars.to_dict('records'):
+            ts_code = bar['ts_code']
+            if ts_code not in states:
+                states[ts_code] = cls._init_stock_states(empty_history)
+            stock_outputs = outputs.setdefault(ts_code, {})
+            for strategy_name, state in states[ts_code].items():
+                strategy_outputs = stock_outputs.setdefault(strategy_name, {})
+                for output_name, value in cls._strategies[strategy_name].update(state, bar).items():
+                    strategy_outputs.setdefault(output_name, []).append(value)
+        return outputs
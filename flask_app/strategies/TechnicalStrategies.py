@@ -1,13 +1,30 @@
 import pandas as pd
 # from BaseStrategy import BaseStrategy
 from strategies.BaseStrategy import BaseStrategy
+from strategies.CrossSectionalStrategy import CrossSectionalStrategy
+from strategies.EvaluationContext import EvaluationContext
+from strategies.Kernels import group_rolling, group_ewm_mean, group_shift, group_fill, RollingWindow, RollingExtreme, ewm_step
+import math
 import os
 
+# An EMA depends on every earlier bar; after this many spans the weight of the bars left out
+# is below (1 - 2/(span+1))**(10*span) ~ e**-20 ~ 2e-9, so a windowed EMA matches the full one to a
+# relative error of about 2e-9 (not to float precision, which would take ~37 spans). Charts do not show the difference.
+EMA_WARMUP_SPANS = 10
+
 # Helper function to replace NaN values (can be reused in data_processor)
 def replace_invalid(arr):
     """Replace invalid values (NaN) with 0."""
     return arr.fillna(0)
 
+def positions_to_labels(index: pd.Index, positions: pd.Series) -> pd.Series:
+    """Map row positions (NaN allowed) to the matching index labels."""
+    pos = positions.to_numpy()
+    valid = ~pd.isna(pos)
+    labels = pd.Series(float('nan'), index=index)
+    labels[valid] = index.to_numpy()[pos[valid].astype(int)]
+    return labels
+
 class VolumeStrategy(BaseStrategy):
     """Volume strategy that returns the volume data."""
     
@@ -17,14 +34,25 @@ class VolumeStrategy(BaseStrategy):
             "period": 20  # Default period for volume-based strategy
         }
 
-    def calculate(self, df: pd.DataFrame, period: int = 20):
+    def calculate(self, df: pd.DataFrame, period: int = 20, context: EvaluationContext = None):
         """Return the volume data for the given period."""
-        df = df.copy()
-        
-        # Simply return the volume data
-        df['volume'] = df['vol']  # Assuming 'vol' is the column containing volume data
-        
-        return df[['volume']]  # Return DataFrame with volume column
+        # Simply return the volume data ('vol' is the column containing volume data)
+        return pd.DataFrame({'volume': df['vol']}, index=df.index)
+
+    def get_lookback(self, period: int = 20):
+        return 0
+
+    def supports_panel(self):
+        return True
+
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 20):
+        return {}
+
+    def update(self, state: dict, bar):
+        return {'volume': float(bar['vol'])}
 
     def name(self):
         """Return the name of the strategy in lowercase."""
@@ -60,25 +88,59 @@ class MACDStrategy(BaseStrategy):
             "signal_period": 9  # Default period for signal line
         }
 
-    def calculate(self, df: pd.DataFrame, fast_period: int=12, slow_period: int=26, signal_period: int=9):
-        df = df.copy()
+    def calculate(self, df: pd.DataFrame, fast_period: int=12, slow_period: int=26, signal_period: int=9,
+                  context: EvaluationContext = None):
+        context = context or EvaluationContext(df)
         # Calculate MACD line (DIF)
-        fast_ema = df['close'].ewm(span=fast_period, adjust=False).mean()
-        slow_ema = df['close'].ewm(span=slow_period, adjust=False).mean()
+        fast_ema = context.ewm('close', fast_period)
+        slow_ema = context.ewm('close', slow_period)
         macd = fast_ema - slow_ema  # This is the MACD line (DIF)
         
         # Calculate Signal line (DEA)
-        signal = macd.ewm(span=signal_period, adjust=False).mean()
+        signal = group_ewm_mean(macd, signal_period, by=context.by)
         
         # Calculate Histogram (MACD - Signal)
         histogram = (macd - signal)*2
 
         # Return DataFrame with all components
-        df['macd'] = macd
-        df['signal'] = signal
-        df['histogram'] = histogram
-        return df[['macd', 'signal', 'histogram']]
+        return pd.DataFrame({'macd': macd, 'signal': signal, 'histogram': histogram}, index=df.index)
+
+    def get_lookback(self, fast_period: int=12, slow_period: int=26, signal_period: int=9):
+        # The signal EMA runs on the slow EMA, so their warm-ups add up
+        return EMA_WARMUP_SPANS * (max(fast_period, slow_period) + signal_period)
+
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, fast_period: int=12, slow_period: int=26, signal_period: int=9):
+        state = {
+            'fast_alpha': 2 / (fast_period + 1),
+            'slow_alpha': 2 / (slow_period + 1),
+            'signal_alpha': 2 / (signal_period + 1),
+            'fast_ema': None,
+            'slow_ema': None,
+            'signal': None
+        }
+        if len(history):
+            # Only the last EMA values are needed to continue the recursion
+            context = EvaluationContext(history)
+            result = self.calculate(history, fast_period, slow_period, signal_period, context=context)
+            state['fast_ema'] = context.ewm('close', fast_period).iloc[-1]
+            state['slow_ema'] = context.ewm('close', slow_period).iloc[-1]
+            state['signal'] = result['signal'].iloc[-1]
+        return state
+
+    def update(self, state: dict, bar):
+        close = float(bar['close'])
+        state['fast_ema'] = ewm_step(state['fast_ema'], close, state['fast_alpha'])
+        state['slow_ema'] = ewm_step(state['slow_ema'], close, state['slow_alpha'])
+        macd = state['fast_ema'] - state['slow_ema']
+        state['signal'] = ewm_step(state['signal'], macd, state['signal_alpha'])
+        return {'macd': macd, 'signal': state['signal'], 'histogram': (macd - state['signal'])*2}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "macd"
@@ -123,21 +185,56 @@ class RSIStrategy(BaseStrategy):
             "period": 5  # Default period for RSI
         }
 
-    def calculate(self, data: pd.DataFrame, period: int = 5):
-        delta = data['close'].diff()
-        gain = (delta.where(delta > 0, 0)).fillna(0)
-        loss = (-delta.where(delta < 0, 0)).fillna(0)
-        avg_gain = gain.rolling(window=period).mean()
-        avg_loss = loss.rolling(window=period).mean()
+    def calculate(self, data: pd.DataFrame, period: int = 5, context: EvaluationContext = None):
+        context = context or EvaluationContext(data)
+        # Gains/losses do not depend on the period, so every RSI period shares them
+        delta = context.diff('close')
+        gain = context.get(('gain', 'close'), lambda: (delta.where(delta > 0, 0)).fillna(0))
+        loss = context.get(('loss', 'close'), lambda: (-delta.where(delta < 0, 0)).fillna(0))
+        avg_gain = group_rolling(gain, period, 'mean', by=context.by)
+        avg_loss = group_rolling(loss, period, 'mean', by=context.by)
 
         rs = avg_gain / avg_loss.replace(0, 0.0001)  # Prevent division by zero
         rsi = 100 - (100 / (1 + rs))
 
-        df = data.copy()
-        df['rsi'] = replace_invalid(rsi)  # Replace NaN values
+        # Return DataFrame with RSI column, NaN values replaced
+        return pd.DataFrame({'rsi': replace_invalid(rsi)}, index=data.index)
+
+    def get_lookback(self, period: int = 5):
+        # One extra bar for the first diff
+        return period
 
-        return df[['rsi']]  # Return DataFrame with RSI column
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 5):
+        # The last `period` gains/losses need one extra close for their first diff
+        tail = history['close'].iloc[-(period + 1):]
+        delta = tail.diff()
+        gain = (delta.where(delta > 0, 0)).fillna(0).tolist()
+        loss = (-delta.where(delta < 0, 0)).fillna(0).tolist()
+        return {
+            'prev_close': float(tail.iloc[-1]) if len(tail) else None,
+            'gains': RollingWindow(period, gain[-period:]),
+            'losses': RollingWindow(period, loss[-period:])
+        }
+
+    def update(self, state: dict, bar):
+        close = float(bar['close'])
+        delta = close - state['prev_close'] if state['prev_close'] is not None else float('nan')
+        state['prev_close'] = close
+        state['gains'].push(delta if delta > 0 else 0.0)
+        state['losses'].push(-delta if delta < 0 else 0.0)
+
+        avg_gain = state['gains'].mean()
+        avg_loss = state['losses'].mean()
+        rs = avg_gain / (avg_loss if avg_loss != 0 else 0.0001)  # Prevent division by zero
+        rsi = 100 - (100 / (1 + rs))
+        return {'rsi': 0.0 if math.isnan(rsi) else rsi}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "rsi"
@@ -165,13 +262,30 @@ class HighestVOLStrategy(BaseStrategy):
             "period": 20  # Default period for volume comparison
         }
 
-    def calculate(self, df: pd.DataFrame, period: int = 20):
-        df = df.copy()
-        df['rolling_max_vol'] = df['vol'].rolling(window=period).max()
-        df['highest_vol_today'] = (df['vol'] == df['rolling_max_vol']).astype(int)  # Convert boolean to 0/1
+    def calculate(self, df: pd.DataFrame, period: int = 20, context: EvaluationContext = None):
+        context = context or EvaluationContext(df)
+        rolling_max_vol = context.rolling_max('vol', period)
+        highest_vol_today = (df['vol'] == rolling_max_vol).astype(int)  # Convert boolean to 0/1
 
-        return df[['highest_vol_today']]  # Return DataFrame with boolean value (0/1)
+        return pd.DataFrame({'highest_vol_today': highest_vol_today}, index=df.index)  # Boolean value (0/1)
+
+    def get_lookback(self, period: int = 20):
+        return period - 1
+
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 20):
+        return {'window': RollingExtreme(period, find_max=True, values=history['vol'].to_numpy()[-period:])}
+
+    def update(self, state: dict, bar):
+        vol = float(bar['vol'])
+        state['window'].push(vol)
+        return {'highest_vol_today': int(vol == state['window'].value())}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "highest_volume_today"
@@ -198,13 +312,30 @@ class LowestVOLStrategy(BaseStrategy):
             "period": 20  # Default period for volume comparison
         }
 
-    def calculate(self, df: pd.DataFrame, period: int = 20):
-        df = df.copy()
-        df['rolling_min_vol'] = df['vol'].rolling(window=period).min()
-        df['lowest_vol_today'] = (df['vol'] == df['rolling_min_vol']).astype(int)  # Convert boolean to 0/1
+    def calculate(self, df: pd.DataFrame, period: int = 20, context: EvaluationContext = None):
+        context = context or EvaluationContext(df)
+        rolling_min_vol = context.rolling_min('vol', period)
+        lowest_vol_today = (df['vol'] == rolling_min_vol).astype(int)  # Convert boolean to 0/1
+
+        return pd.DataFrame({'lowest_vol_today': lowest_vol_today}, index=df.index)  # Boolean value (0/1)
 
-        return df[['lowest_vol_today']]  # Return DataFrame with boolean value (0/1)
+    def get_lookback(self, period: int = 20):
+        return period - 1
+
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 20):
+        return {'window': RollingExtreme(period, find_max=False, values=history['vol'].to_numpy()[-period:])}
+
+    def update(self, state: dict, bar):
+        vol = float(bar['vol'])
+        state['window'].push(vol)
+        return {'lowest_vol_today': int(vol == state['window'].value())}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "lowest_volume_today"
@@ -231,19 +362,36 @@ class ExistHighestVOLStrategy(BaseStrategy):
             "period": 7  # Default period for volume comparison
         }
 
-    def calculate(self, df: pd.DataFrame, period: int = 100):
-        df = df.copy()
+    def calculate(self, df: pd.DataFrame, period: int = 100, context: EvaluationContext = None):
+        context = context or EvaluationContext(df)
         
         # Find the index of the highest volume in the rolling window
-        df['highest_vol_idx'] = df['vol'].rolling(window=period).apply(lambda x: x.idxmax(), raw=False)
+        highest_vol_idx = positions_to_labels(df.index, context.rolling_argmax('vol', period))
 
         # Calculate how many days have passed since the highest volume appeared
         # Use a safe approach to handle NaN values
-        df['days_since_highest_vol'] = (df.index - df['highest_vol_idx']).fillna(0).astype(int)
-        # print(df['days_since_highest_vol'].tail(20))
-        # print(df[['days_since_highest_vol']])
-        return df[['days_since_highest_vol']]  # Return DataFrame with the days passed
+        days_since_highest_vol = (df.index - highest_vol_idx).fillna(0).astype(int)
+        return pd.DataFrame({'days_since_highest_vol': days_since_highest_vol}, index=df.index)  # Days passed
+
+    def get_lookback(self, period: int = 100):
+        return period - 1
+
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 100):
+        values = history['vol'].to_numpy()[-period:]
+        return {'window': RollingExtreme(period, find_max=True, values=values, start=len(history) - len(values))}
+
+    def update(self, state: dict, bar):
+        window = state['window']
+        window.push(float(bar['vol']))
+        days = window.position - window.arg()
+        return {'days_since_highest_vol': 0 if math.isnan(days) else int(days)}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "days_since_last_high"
@@ -271,18 +419,37 @@ class ExistLowestVOLStrategy(BaseStrategy):
             "period": 7  # Default period for volume comparison
         }
 
-    def calculate(self, df: pd.DataFrame, period: int = 100):
-        df = df.copy()
+    def calculate(self, df: pd.DataFrame, period: int = 100, context: EvaluationContext = None):
+        context = context or EvaluationContext(df)
         
         # Find the index of the lowest volume in the rolling window
-        df['lowest_vol_idx'] = df['vol'].rolling(window=period).apply(lambda x: x.idxmin(), raw=False)
+        lowest_vol_idx = positions_to_labels(df.index, context.rolling_argmin('vol', period))
         
         # Calculate how many days have passed since the lowest volume appeared
         # Use a safe approach to handle NaN values
-        df['days_since_lowest_vol'] = (df.index - df['lowest_vol_idx']).fillna(0).astype(int)
+        days_since_lowest_vol = (df.index - lowest_vol_idx).fillna(0).astype(int)
         
-        return df[['days_since_lowest_vol']]  # Return DataFrame with the days passed
+        return pd.DataFrame({'days_since_lowest_vol': days_since_lowest_vol}, index=df.index)  # Days passed
+
+    def get_lookback(self, period: int = 100):
+        return period - 1
+
+    def supports_panel(self):
+        return True
     
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, period: int = 100):
+        values = history['vol'].to_numpy()[-period:]
+        return {'window': RollingExtreme(period, find_max=False, values=values, start=len(history) - len(values))}
+
+    def update(self, state: dict, bar):
+        window = state['window']
+        window.push(float(bar['vol']))
+        days = window.position - window.arg()
+        return {'days_since_lowest_vol': 0 if math.isnan(days) else int(days)}
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "days_since_last_low"
@@ -311,17 +478,50 @@ class MAStrategy(BaseStrategy):
             "periods": [5, 10, 20]  # Default periods for MA calculations
         }
 
-    def calculate(self, df: pd.DataFrame, periods: list = [5, 10, 20]):
+    def calculate(self, df: pd.DataFrame, periods: list = [5, 10, 20], context: EvaluationContext = None):
         """Calculate moving averages for the specified periods."""
-        df = df.copy()
-        result_df = pd.DataFrame()
+        context = context or EvaluationContext(df)
+        result_df = pd.DataFrame(index=df.index)
         
         for period in periods:
             ma_name = f'ma{period}'
-            result_df[ma_name] = df['close'].rolling(window=period).mean().bfill().ffill()
+            result_df[ma_name] = group_fill(context.rolling_mean('close', period), by=context.by)
         
         return result_df
 
+    def calculate_grid(self, df: pd.DataFrame, param_sets: list, context: EvaluationContext = None):
+        """Calculate several period lists at once; every window comes from one cumulative sum of close."""
+        context = context or EvaluationContext(df)
+        results = []
+        for params in param_sets:
+            result_df = pd.DataFrame(index=df.index)
+            for period in params['periods']:
+                result_df[f'ma{period}'] = group_fill(context.rolling_mean_prefix('close', period), by=context.by)
+            results.append(result_df)
+        return results
+
+    def get_lookback(self, periods: list = [5, 10, 20]):
+        return max(periods, default=1) - 1
+
+    def supports_panel(self):
+        return True
+
+    def supports_incremental(self):
+        return True
+
+    def init_state(self, history: pd.DataFrame, periods: list = [5, 10, 20]):
+        close = history['close'].to_numpy()
+        return {'windows': {period: RollingWindow(period, close[-period:]) for period in periods}}
+
+    def update(self, state: dict, bar):
+        """Warm-up values are NaN here; calculate back-fills them from later bars."""
+        close = float(bar['close'])
+        outputs = {}
+        for period, window in state['windows'].items():
+            window.push(close)
+            outputs[f'ma{period}'] = window.mean()
+        return outputs
+
     def name(self):
         """Return the name of the strategy in lowercase."""
         return "ma"
@@ -376,7 +576,8 @@ class RelativeReturnStrategy(BaseStrategy):
             "column": "close"  # Default column to calculate returns for
         }
 
-    def calculate(self, df: pd.DataFrame, N: int = 5, M: int = 20, column: str = "close"):
+    def calculate(self, df: pd.DataFrame, N: int = 5, M: int = 20, column: str = "close",
+                  context: EvaluationContext = None):
         """
         Calculate relative return ratio comparing current value to N-day average from M days ago.
         
@@ -385,6 +586,7 @@ class RelativeReturnStrategy(BaseStrategy):
             N: The period for calculating the moving average
             M: The number of days to shift the average
             column: The column to calculate returns for
+            context: Optional EvaluationContext built on df
             
         Returns:
             DataFrame with relative return ratio column
@@ -392,33 +594,30 @@ class RelativeReturnStrategy(BaseStrategy):
         self.N = N  # Store the user-defined N
         self.M = M  # Store the user-defined M
         
-        df = df.copy()
-        df = df.reset_index(drop=True)  # Reset index to ensure consistent calculations
+        context = context or EvaluationContext(df)
         
         # Ensure the column exists
         if column not in df.columns:
             raise ValueError(f"Column {column} not found in DataFrame")
             
         # Calculate N-day moving average
-        avg_name = f'avg_{column}_last_{N}_days'
-        df[avg_name] = df[column].rolling(window=N, min_periods=1).mean()
-        df[avg_name] = replace_invalid(df[avg_name])
+        avg = replace_invalid(context.rolling_mean(column, N, min_periods=1))
         
         # Shift the average by M days
-        shifted_avg_name = f'{avg_name}_shifted_{M}'
-        df[shifted_avg_name] = df[avg_name].shift(M)
-        df[shifted_avg_name] = replace_invalid(df[shifted_avg_name])
+        shifted_avg = replace_invalid(group_shift(avg, M, by=context.by))
         
         # Calculate relative return ratio
-        relative_return = f'relative_return_{N}_{M}'
-        df[relative_return] = df[column] / df[shifted_avg_name].replace(0, float('nan')) - 1
-        df[relative_return] = replace_invalid(df[relative_return])
+        relative_return = replace_invalid(df[column] / shifted_avg.replace(0, float('nan')) - 1)
         
-        # Create result DataFrame with only the relative return column
-        result_df = pd.DataFrame(index=df.index)
-        result_df[relative_return] = df[relative_return]
-        
-        return result_df
+        # Create result DataFrame with only the relative return column, index reset for consistent output
+        return pd.DataFrame({f'relative_return_{N}_{M}': relative_return.to_numpy()})
+
+    def get_lookback(self, N: int = 5, M: int = 20, column: str = "close"):
+        # Averages over fewer than N bars (min_periods=1) must not appear in the shifted window
+        return N - 1 + M
+
+    def supports_panel(self):
+        return True
 
     def name(self):
         """Return the name of the strategy in lowercase."""
@@ -445,7 +644,7 @@ class RelativeReturnStrategy(BaseStrategy):
 
 
 
-class RankPercentageStrategy(BaseStrategy):
+class RankPercentageStrategy(CrossSectionalStrategy):
     """
     Strategy that calculates normalized rank percentages across all stocks for each date.
     This is a cross-based strategy that requires data from all stocks to calculate ranks.
@@ -457,60 +656,18 @@ class RankPercentageStrategy(BaseStrategy):
             "column": "close"  # Default column to rank
         }
 
-    def calculate(self, df: pd.DataFrame, column: str = "close"):
+    def cross_section(self, grouped):
         """
-        Calculate normalized rank percentages for each stock at each timestamp.
-        
-        Args:
-            df: DataFrame containing all stocks data with MultiIndex [ts_code, date]
-            column: Column name to calculate ranks for
-            
-        Returns:
-            DataFrame with normalized rank percentage column
+        Rank every stock within its date and normalize to the 0-100 range.
+        Dates with a single stock get 0.
         """
-        df = df.copy()
-        
-        # Ensure the column exists
-        if column not in df.columns:
-            raise ValueError(f"Column {column} not found in DataFrame")
-        
-        # Initialize result DataFrame with the same index as input
-        result_df = pd.DataFrame(index=df.index)
-        result_df['rank_percentage'] = 0.0
-        
-        # Get unique dates from the index
-        if isinstance(df.index, pd.MultiIndex):
-            dates = df.index.get_level_values('date').unique()
-        else:
-            # If somehow we don't have a MultiIndex, try to get dates from column
-            if 'date' in df.columns:
-                dates = df['date'].unique()
-            else:
-                raise ValueError("No date information found in DataFrame")
-        
-        # Calculate ranks for each date
-        for date in dates:
-            if isinstance(df.index, pd.MultiIndex):
-                # Get data for this date using the MultiIndex
-                date_data = df.xs(date, level='date', drop_level=False)
-            else:
-                # Fallback to column-based selection
-                date_data = df[df['date'] == date]
-            
-            # Calculate ranks for this date
-            ranks = date_data[column].rank(ascending=True)
-            count = len(ranks)
-            
-            # Normalize to 0-100 range
-            if count > 1:
-                normalized_ranks = (ranks - 1) / (count - 1) * 100
-            else:
-                normalized_ranks = ranks * 0
-            
-            # Assign ranks back to result DataFrame
-            result_df.loc[date_data.index, 'rank_percentage'] = normalized_ranks
-        
-        return result_df[['rank_percentage']]
+        ranks = grouped.rank(ascending=True)
+        count = grouped.transform('size')
+        normalized_ranks = (ranks - 1) / (count - 1) * 100
+        return normalized_ranks.where(count > 1, ranks * 0)
+
+    def output_name(self):
+        return 'rank_percentage'
 
     def name(self):
         """Return the name of the strategy in lowercase."""
@@ -530,9 +687,6 @@ class RankPercentageStrategy(BaseStrategy):
             }
         }
 
-    def is_self_based(self):
-        """This strategy requires data from all stocks for comparison."""
-        return False
 
 
 
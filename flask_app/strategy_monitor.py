@@ -1,17 +1,22 @@
 import os
 import pandas as pd
 from strategies.StrategyManager import StrategyManager
-from models import db, StrategyResult
-from data_loader.data_processor import get_params_hash, save_strategy_result
-import hashlib
-import json
+from strategies.EvaluationContext import EvaluationContext
+from models import db, StrategyResult, configure_engines
+from data_loader.data_processor import get_params_hash, save_strategy_results
+from data_loader.result_store import get_result_store
+from data_loader.data_loader import (StockDataset, build_strategy_input, save_columns_npy, load_columns_npy,
+                                    load_parquet, is_parquet_sorted, resolve_market_data_path,
+                                    NUMERICAL_COLUMNS)
 from datetime import datetime
 from flask import Flask
 from config import Config
 import time
 import logging
+import shutil
+import tempfile
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 
 # Set up logging
@@ -25,77 +30,56 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def optimize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Optimize DataFrame memory usage and convert data types efficiently."""
-    df = df.copy()
-    
-    # Convert numerical columns to appropriate dtypes
-    numerical_columns = ['open', 'high', 'low', 'close', 'vol', 'amount']
-    for col in numerical_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce', downcast='float')
-    
-    # Convert date to datetime if it's not already
-    if 'date' in df.columns:
-        if pd.api.types.is_string_dtype(df['date']):
-            # Convert string date in format 'YYYYMMDD' to datetime
-            df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-        elif not pd.api.types.is_datetime64_any_dtype(df['date']):
-            df['date'] = pd.to_datetime(df['date'])
-    
-    return df
+# Workers memory-map the strategy input from here; /dev/shm keeps the files in RAM on Linux
+SHARED_INPUT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
 
-def batch_save_strategy_results(results: list):
-    """Batch save strategy results to improve database performance."""
-    try:
-        db.session.bulk_save_objects(results)
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"Error in batch saving results: {str(e)}")
-        db.session.rollback()
+def batch_save_strategy_results(results: list, dataset: StockDataset = None):
+    """
+    Batch save strategy results (dicts with ts_code, strategy_name, params_hash and result_data)
+    to the configured result store; results that already exist are replaced instead of failing the batch.
+    Pass the dataset to attach each stock's dates, which the Parquet store keeps next to the outputs.
+    """
+    if dataset is not None:
+        for result in results:
+            result.setdefault('dates', dataset.get(result['ts_code'])['date'].to_numpy())
+    if save_strategy_results(results, Config.RESULT_UPSERT_BATCH_SIZE) < len(results):
+        logger.error(f"Error in batch saving {len(results)} results")
 
 def process_self_based_strategies_batch(stock_data: dict, strategies: list):
-    """Process multiple self-based strategies for a stock in parallel."""
+    """Process multiple self-based strategies for a stock, sharing one evaluation context."""
     results = []
-    
-    def process_single_strategy(strategy, df):
+    df = build_strategy_input(stock_data['df'])
+    context = EvaluationContext(df)  # Shared by all strategies of this stock
+
+    for strategy in strategies:
         try:
             default_params = strategy.get_input_parameters()
             params_hash = get_params_hash(default_params)
-            result = process_stock_data(df, strategy, default_params)
-            if result:
-                return (strategy.name(), params_hash, result)
-        except Exception as e:
-            logger.error(f"Error processing strategy {strategy.name()}: {str(e)}")
-        return None
-    
-    with ThreadPoolExecutor(max_workers=min(len(strategies), 4)) as executor:
-        futures = [
-            executor.submit(process_single_strategy, strategy, stock_data['df'])
-            for strategy in strategies
-        ]
-        
-        for future in as_completed(futures):
-            result = future.result()
+            result = process_stock_data(df, strategy, default_params, context)
             if result:
-                strategy_name, params_hash, data = result
                 results.append({
                     'ts_code': stock_data['ts_code'],
-                    'strategy_name': strategy_name,
+                    'strategy_name': strategy.name(),
                     'params_hash': params_hash,
-                    'result_data': data
+                    'result_data': result
                 })
-    
+        except Exception as e:
+            logger.error(f"Error processing strategy {strategy.name()}: {str(e)}")
+
     return results
 
-def process_cross_based_strategies_batch(df: pd.DataFrame, strategies: list):
-    """Process all cross-based strategies in one pass."""
+def process_cross_based_strategies_batch(panel: pd.DataFrame, strategies: list):
+    """
+    Process all cross-based strategies in one pass.
+    :param panel: StockDataset.get_panel(with_dates=True); results are row-aligned with it.
+    """
     results = {}
     
     for strategy in strategies:
         try:
             default_params = strategy.get_input_parameters()
             params_hash = get_params_hash(default_params)
-            df_result = process_cross_based_strategy(df, strategy, default_params)
+            df_result = process_cross_based_strategy(panel, strategy, default_params)
             
             if df_result is not None:
                 results[strategy.name()] = {
@@ -108,6 +92,194 @@ def process_cross_based_strategies_batch(df: pd.DataFrame, strategies: list):
     
     return results
 
+def process_panel_strategies_batch(panel: pd.DataFrame, strategies: list):
+    """
+    Process self-based strategies that support panel mode in one vectorized pass over all stocks of a panel.
+    Results are row-aligned with the panel, like cross-based results.
+    """
+    results = {}
+
+    for strategy in strategies:
+        try:
+            default_params = strategy.get_input_parameters()
+            params_hash = get_params_hash(default_params)
+            df_result = strategy.calculate_panel(panel, **default_params)
+            results[strategy.name()] = {
+                'result': df_result,
+                'params_hash': params_hash,
+                'strategy': strategy
+            }
+        except Exception as e:
+            logger.error(f"Error processing panel strategy {strategy.name()}: {str(e)}")
+
+    return results
+
+# Persistent pool for self-based strategies, reused across monitoring cycles
+_process_pool = None
+_process_pool_workers = None
+
+# Per-worker state: the attached strategy input and a strategy manager
+_worker_state = {}
+
+def get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Get the monitor's process pool, creating it on first use."""
+    global _process_pool, _process_pool_workers
+    if _process_pool is None or _process_pool_workers != max_workers:
+        shutdown_process_pool()
+        _process_pool = ProcessPoolExecutor(max_workers=max_workers)
+        _process_pool_workers = max_workers
+    return _process_pool
+
+def shutdown_process_pool():
+    """Stop the monitor's process pool, if any."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+def _attach_strategy_input(column_paths: dict) -> pd.DataFrame:
+    """Memory-map the strategy input in a worker, once per dataset rather than once per task."""
+    if _worker_state.get('column_paths') != column_paths:
+        _worker_state['numeric'] = load_columns_npy(column_paths)
+        _worker_state['column_paths'] = column_paths
+    if 'manager' not in _worker_state:
+        _worker_state['manager'] = StrategyManager()
+    return _worker_state['numeric']
+
+def process_shard(column_paths: dict, shard: list) -> list:
+    """
+    Worker task: compute the missing self-based strategies of a run of tickers.
+    Panel-capable strategies run once over the whole shard, the others stock by stock.
+
+    :param column_paths: Memory-mapped strategy input written by save_columns_npy
+    :param shard: List of (ts_code, start, end, missing strategy names) in row order. Tickers that are
+                  not missing may sit between them, so the rows of the shard are not necessarily contiguous
+    :return: Result rows as plain dicts; the parent process writes them to the database
+    """
+    numeric = _attach_strategy_input(column_paths)
+    manager = _worker_state['manager']
+
+    needed = set().union(*(missing for _, _, _, missing in shard))
+    strategies = [manager.get_strategy(name) for name in sorted(needed)]
+    strategies = [s for s in strategies if s and s.is_self_based()]
+    panel_strategies = [s for s in strategies if s.supports_panel()]
+    stock_strategies = [s for s in strategies if not s.supports_panel()]
+
+    rows = []
+    if panel_strategies:
+        # Shard panel: the shard tickers' own rows plus their ts_code key. A contiguous shard is
+        # one slice of the mapped columns (no copy); otherwise the tickers' slices are concatenated.
+        lengths = np.array([end - start for _, start, end, _ in shard])
+        panel_offsets = np.concatenate(([0], np.cumsum(lengths)))
+        contiguous = all(shard[i][2] == shard[i + 1][1] for i in range(len(shard) - 1))
+        columns = {'ts_code': np.repeat(np.array([ts for ts, _, _, _ in shard], dtype=object), lengths)}
+        for c in numeric.columns:
+            values = numeric[c].to_numpy()
+            if contiguous:
+                columns[c] = values[shard[0][1]:shard[-1][2]]
+            else:
+                columns[c] = np.concatenate([values[start:end] for _, start, end, _ in shard])
+        panel = pd.DataFrame(columns, copy=False)
+        panel_results = process_panel_strategies_batch(panel, panel_strategies)
+
+        for (ts_code, start, end, missing), panel_start, panel_end in zip(shard, panel_offsets[:-1], panel_offsets[1:]):
+            if end - start < 2:
+                continue
+            for strategy_name, result_data in panel_results.items():
+                if strategy_name in missing:
+                    stock_result = result_data['result'].iloc[panel_start:panel_end]
+                    rows.append({
+                        'ts_code': ts_code,
+                        'strategy_name': strategy_name,
+                        'params_hash': result_data['params_hash'],
+                        'result_data': build_result_entry(stock_result, result_data['strategy'])
+                    })
+
+    if stock_strategies:
+        for ts_code, start, end, missing in shard:
+            to_process = [s for s in stock_strategies if s.name() in missing]
+            if end - start < 2 or not to_process:
+                continue
+            rows.extend(process_self_based_strategies_batch(
+                {'ts_code': ts_code, 'df': numeric.iloc[start:end]},
+                to_process
+            ))
+
+    return rows
+
+def process_self_based_strategies_parallel(dataset: StockDataset, missing_combinations: dict, max_workers: int = None):
+    """
+    Process the missing self-based strategies of all stocks on the process pool.
+    The strategy input is written once to memory-mapped .npy files that every worker maps read-only,
+    so no DataFrame is pickled. Tickers are sharded in row order, and results stream back
+    to this process, the single database writer.
+    """
+    max_workers = max_workers or Config.STRATEGY_MONITOR_WORKERS or os.cpu_count() or 1
+    ts_codes = [ts for ts in dataset.ts_codes() if ts in missing_combinations]
+    if not ts_codes:
+        return
+
+    # A few shards per worker balance uneven tickers without much per-task overhead
+    n_shards = min(len(ts_codes), max_workers * 4)
+    shards = [
+        [(ts, *dataset.get_offsets(ts), missing_combinations[ts]) for ts in chunk]
+        for chunk in np.array_split(np.array(ts_codes, dtype=object), n_shards)
+    ]
+
+    shared_dir = tempfile.mkdtemp(prefix='strategy_monitor_', dir=SHARED_INPUT_DIR)
+    try:
+        column_paths = save_columns_npy(dataset.numeric, shared_dir)
+        pool = get_process_pool(max_workers)
+        futures = {pool.submit(process_shard, column_paths, shard): shard for shard in shards}
+
+        with tqdm(total=len(ts_codes), desc="Processing stocks") as pbar:
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing stock shard: {str(e)}")
+                    rows = []
+                if rows:
+                    batch_save_strategy_results(rows, dataset)
+                pbar.update(len(futures[future]))
+    finally:
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+def save_aligned_results(dataset: StockDataset, aligned_results: dict, missing_combinations: dict, desc: str):
+    """
+    Split results row-aligned with dataset.df into per-stock entries and save the missing ones,
+    upserting Config.RESULT_UPSERT_BATCH_SIZE rows at a time rather than one transaction per stock.
+    """
+    batch_results = []
+    for ts_code in tqdm(missing_combinations.keys(), desc=desc):
+        stock_data = dataset.get(ts_code)
+        if len(stock_data) < 2:
+            continue
+            
+        for strategy_name, result_data in aligned_results.items():
+            if strategy_name in missing_combinations[ts_code]:
+                result = create_strategy_result_entry(
+                    result_data['result'], 
+                    result_data['strategy'],
+                    ts_code,
+                    dataset
+                )
+                if result:
+                    batch_results.append({
+                        'ts_code': ts_code,
+                        'strategy_name': strategy_name,
+                        'params_hash': result_data['params_hash'],
+                        'result_data': result,
+                        'dates': stock_data['date'].to_numpy()
+                    })
+        
+        if len(batch_results) >= Config.RESULT_UPSERT_BATCH_SIZE:
+            batch_save_strategy_results(batch_results)
+            batch_results = []
+
+    if batch_results:
+        batch_save_strategy_results(batch_results)
+
 def process_new_strategies():
     """Optimized version of strategy processing."""
     try:
@@ -115,12 +287,21 @@ def process_new_strategies():
         app = Flask(__name__)
         app.config.from_object(Config)
         db.init_app(app)
+        configure_engines(app, read_only=False)
 
         with app.app_context():
             # Load and optimize data
             parquet_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'merged_data.parquet'))
-            df = pd.read_parquet(parquet_file_path)
-            df = optimize_dataframe(df)
+            parquet_file_path = resolve_market_data_path(parquet_file_path)
+            if os.path.isfile(parquet_file_path) and not is_parquet_sorted(parquet_file_path):
+                # StockDataset sorts in memory; the file itself is only rewritten by the explicit sort step
+                print(f"{parquet_file_path} is not sorted, run: python -m data_loader.data_loader --sort")
+            df = load_parquet(parquet_file_path, columns=['ts_code', 'date'] + NUMERICAL_COLUMNS)
+            if df is None:
+                return
+            dataset = StockDataset(df, price_dtype=Config.PRICE_DTYPE)
+            print(dataset.memory_usage())
+            df = dataset.df
             
             # Get missing combinations
             missing_combinations = get_missing_strategy_combinations(df)
@@ -140,74 +321,24 @@ def process_new_strategies():
             # Process cross-based strategies first (one pass for all stocks)
             if cross_based_strategies:
                 print("Processing cross-based strategies...")
-                cross_results = process_cross_based_strategies_batch(df, cross_based_strategies)
+                cross_results = process_cross_based_strategies_batch(dataset.get_panel(with_dates=True), cross_based_strategies)
                 
                 # Save cross-based results for each stock
-                for ts_code in tqdm(missing_combinations.keys(), desc="Saving cross-based results"):
-                    stock_data = df[df['ts_code'] == ts_code]
-                    if len(stock_data) < 2:
-                        continue
-                        
-                    batch_results = []
-                    for strategy_name, result_data in cross_results.items():
-                        if strategy_name in missing_combinations[ts_code]:
-                            result = create_strategy_result_entry(
-                                result_data['result'], 
-                                result_data['strategy'],
-                                ts_code,
-                                stock_data
-                            )
-                            if result:
-                                batch_results.append(StrategyResult(
-                                    ts_code=ts_code,
-                                    strategy_name=strategy_name,
-                                    params_hash=result_data['params_hash'],
-                                    result_data=result
-                                ))
-                    
-                    if batch_results:
-                        batch_save_strategy_results(batch_results)
-
-            # Process self-based strategies
-            print("Processing self-based strategies...")
-            first_stock = True
-            with tqdm(total=len(missing_combinations), desc="Processing stocks") as pbar:
-                for ts_code, missing_strategies in missing_combinations.items():
-                    if first_stock:
-                        print(f"\nFirst stock to process: {ts_code}")
-                        input("Press Enter to process the first stock...")
-                        first_stock = False
-                    
-                    stock_df = df[df['ts_code'] == ts_code].copy()
-                    if len(stock_df) < 2:
-                        pbar.update(1)
-                        continue
-
-                    # Filter for self-based strategies only
-                    self_strategies_to_process = [
-                        s for s in self_based_strategies 
-                        if s.name() in missing_strategies
-                    ]
-                    
-                    if self_strategies_to_process:
-                        results = process_self_based_strategies_batch(
-                            {'ts_code': ts_code, 'df': stock_df},
-                            self_strategies_to_process
-                        )
-                        
-                        if results:
-                            batch_results = [
-                                StrategyResult(
-                                    ts_code=r['ts_code'],
-                                    strategy_name=r['strategy_name'],
-                                    params_hash=r['params_hash'],
-                                    result_data=r['result_data']
-                                )
-                                for r in results
-                            ]
-                            batch_save_strategy_results(batch_results)
-                    
-                    pbar.update(1)
+                save_aligned_results(dataset, cross_results, missing_combinations, "Saving cross-based results")
+
+            # Process self-based strategies on the process pool, sharded by ticker
+            self_based_names = {s.name() for s in self_based_strategies}
+            self_missing = {
+                ts_code: missing & self_based_names
+                for ts_code, missing in missing_combinations.items()
+                if missing & self_based_names
+            }
+            if self_missing:
+                print("Processing self-based strategies...")
+                process_self_based_strategies_parallel(dataset, self_missing)
+
+            # Merge the part files the batched saves appended (Parquet result store)
+            get_result_store().compact()
 
             print("Completed processing all strategies.")
 
@@ -223,151 +354,97 @@ def get_missing_strategy_combinations(df: pd.DataFrame = None):
     """
     Check which combinations of ts_code and strategy are missing.
     Returns a dictionary mapping ts_codes to their missing strategies.
+
+    A combination is done only if a result exists for the strategy's current default params (params_hash),
+    so changed defaults are recomputed. The result store computes only the missing pairs
+    (an anti-join in the database for the SQL store).
     """
-    # Get all processed combinations
-    processed_combinations = {
-        (result.ts_code, result.strategy_name) 
-        for result in StrategyResult.query.with_entities(
-            StrategyResult.ts_code, 
-            StrategyResult.strategy_name
-        ).distinct()
-    }
-    
-    # Get all available strategies
+    # Get all available strategies and the params hash their results are stored under
     manager = StrategyManager()
-    available_strategies = manager.available_strategies()
-    
-    # If df is not provided, load it
-    # if df is None:
-    #     parquet_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'merged_data.parquet'))
-    #     df = pd.read_parquet(parquet_file_path)
+    targets = [
+        (name, get_params_hash(manager.get_strategy(name).get_input_parameters()))
+        for name in manager.available_strategies()
+    ]
     
     # Get all unique ts_codes from the parquet file
-    all_ts_codes = df['ts_code'].unique()
-    
-    # Find missing combinations
+    all_ts_codes = [str(ts_code) for ts_code in df['ts_code'].unique()]
+    missing_rows = get_result_store().get_missing(all_ts_codes, targets)
+
     missing_combinations = {}
-    for ts_code in all_ts_codes:
-        missing_strategies = set()
-        for strategy_name in available_strategies:
-            if (ts_code, strategy_name) not in processed_combinations:
-                missing_strategies.add(strategy_name)
-        if missing_strategies:
-            missing_combinations[ts_code] = missing_strategies
+    for ts_code, strategy_name in missing_rows:
+        missing_combinations.setdefault(ts_code, set()).add(strategy_name)
             
     return missing_combinations
 
-def process_stock_data(df: pd.DataFrame, strategy, default_params: dict) -> dict:
-    """Process a single stock's data with a strategy."""
-    df = df.copy()
-    numerical_columns = ['open', 'high', 'low', 'close', 'vol', 'amount']
-    df = df[numerical_columns].copy()
-    df = df.astype(float)
-
-    try:
-        # Calculate strategy results
-        df_result = strategy.calculate(df, **default_params)
-        strategy_config = strategy.get_config()
-
-        # Create the result entry
-        result_entry = {
-            'data': {},
-            'config': {
-                'chart_group': strategy_config.get('chart_group', strategy.name()),
-                'chart_name': strategy_config.get('chart_name', strategy.name()),
-                'outputs': {}
-            }
+def build_result_entry(stock_result: pd.DataFrame, strategy) -> dict:
+    """Build the stored result entry (output data lists plus chart config) from one stock's result rows."""
+    strategy_config = strategy.get_config()
+    result_entry = {
+        'data': {},
+        'config': {
+            'chart_group': strategy_config.get('chart_group', strategy.name()),
+            'chart_name': strategy_config.get('chart_name', strategy.name()),
+            'outputs': {}
         }
+    }
 
-        # Process each output
-        for output_name in df_result.columns:
-            output_config = strategy_config.get('outputs', {}).get(output_name, {
-                'type': 'line',
-                'color': '#FFA500',
-                'name': output_name,
-                'order': 1
-            })
-            
-            result_entry['data'][output_name] = df_result[output_name].tolist()
-            result_entry['config']['outputs'][output_name] = output_config
+    # Process each output
+    for output_name in stock_result.columns:
+        output_config = strategy_config.get('outputs', {}).get(output_name, {
+            'type': 'line',
+            'color': '#FFA500',
+            'name': output_name,
+            'order': 1
+        })
+        
+        result_entry['data'][output_name] = stock_result[output_name].tolist()
+        result_entry['config']['outputs'][output_name] = output_config
+
+    return result_entry
+
+def process_stock_data(df: pd.DataFrame, strategy, default_params: dict, context: EvaluationContext = None) -> dict:
+    """
+    Process a single stock's data with a strategy.
+    Pass a context built on the same stock to share intermediates between strategies.
+    """
+    df = build_strategy_input(df)
 
-        return result_entry
+    try:
+        # Calculate strategy results
+        df_result = strategy.calculate(df, context=context or EvaluationContext(df), **default_params)
+        return build_result_entry(df_result, strategy)
 
     except Exception as e:
         logger.error(f"Error processing strategy {strategy.name()}: {str(e)}")
         return None
 
-def process_self_based_strategy(df: pd.DataFrame, strategy, default_params: dict, ts_code: str):
+def process_self_based_strategy(dataset: StockDataset, strategy, default_params: dict, ts_code: str):
     """Process a self-based strategy for a single stock."""
-    stock_df = df[df['ts_code'] == ts_code].copy()
+    stock_df = dataset.get(ts_code)
     return process_stock_data(stock_df, strategy, default_params)
 
-def process_cross_based_strategy(df: pd.DataFrame, strategy, default_params: dict) -> pd.DataFrame:
+def process_cross_based_strategy(panel: pd.DataFrame, strategy, default_params: dict) -> pd.DataFrame:
     """
     Process a cross-based strategy for all stocks at once.
-    Returns the complete DataFrame with strategy results.
+    The panel is already canonical (float columns, datetime64 'date'), so it is passed as is: no copy, no conversion.
+    Returns the complete DataFrame with strategy results, row-aligned with the panel.
     """
     try:
-        # Ensure numerical columns are float
-        numerical_columns = ['open', 'high', 'low', 'close', 'vol', 'amount']
-        df_processed = df.copy()
-        
-        # Ensure date column is properly formatted
-        if 'date' in df_processed.columns:
-            if pd.api.types.is_string_dtype(df_processed['date']):
-                # Convert string date in format 'YYYYMMDD' to datetime
-                df_processed['date'] = pd.to_datetime(df_processed['date'], format='%Y%m%d')
-            elif not pd.api.types.is_datetime64_any_dtype(df_processed['date']):
-                df_processed['date'] = pd.to_datetime(df_processed['date'])
-        
-        # Convert numerical columns
-        for col in numerical_columns:
-            df_processed[col] = pd.to_numeric(df_processed[col], errors='coerce')
-        
-        # Set index to maintain alignment but keep date column
-        if 'date' in df_processed.columns:
-            df_processed = df_processed.set_index(['ts_code', 'date'])
-        
-        # Calculate strategy results for all stocks at once
-        df_result = strategy.calculate(df_processed, **default_params)
+        # Calculate strategy results for all stocks at once, grouped by the 'date' column
+        df_result = strategy.calculate(panel, **default_params)
         return df_result
     except Exception as e:
         logger.error(f"Error processing cross-based strategy {strategy.name()}: {str(e)}")
         return None
 
-def create_strategy_result_entry(df_result: pd.DataFrame, strategy, ts_code: str, df: pd.DataFrame) -> dict:
+def create_strategy_result_entry(df_result: pd.DataFrame, strategy, ts_code: str, dataset: StockDataset) -> dict:
     """
     Create a result entry dictionary for storing in the database.
     For cross-based strategies, filters the results for the specific ts_code.
+    df_result must be row-aligned with dataset.df.
     """
-    strategy_config = strategy.get_config()
-    result_entry = {
-        'data': {},
-        'config': {
-            'chart_group': strategy_config.get('chart_group', strategy.name()),
-            'chart_name': strategy_config.get('chart_name', strategy.name()),
-            'outputs': {}
-        }
-    }
-
-    # Get the data for this specific stock
-    stock_data = df[df['ts_code'] == ts_code]
-
-    # Process each output column
-    for output_name in df_result.columns:
-        output_config = strategy_config.get('outputs', {}).get(output_name, {
-            'type': 'line',
-            'color': '#FFA500',
-            'name': output_name,
-            'order': 1
-        })
-        
-        # Get the data for this stock's dates
-        stock_result = df_result.loc[stock_data.index]
-        result_entry['data'][output_name] = stock_result[output_name].tolist()
-        result_entry['config']['outputs'][output_name] = output_config
-
-    return result_entry
+    # Get the rows for this specific stock from the ticker offset index
+    return build_result_entry(dataset.slice_aligned(df_result, ts_code), strategy)
 
 # def process_new_strategies():
 #     """
@@ -473,18 +550,18 @@ def create_strategy_result_entry(df_result: pd.DataFrame, strategy, ts_code: str
 #         logger.error(f"Error in process_new_strategies: {str(e)}")
 
 def clear_all_strategy_data():
-    """Clear all strategy results from the database."""
+    """Clear all strategy results from the configured result store."""
     try:
-        print("Clearing all strategy data from database...")
+        print("Clearing all strategy data from the result store...")
         app = Flask(__name__)
         app.config.from_object(Config)
         db.init_app(app)
+        configure_engines(app, read_only=False)
 
         with app.app_context():
-            # Delete all records from StrategyResult table
-            count = StrategyResult.query.delete()
-            db.session.commit()
-            print(f"Successfully deleted {count} strategy results from database.")
+            # Delete all stored results
+            count = get_result_store().clear()
+            print(f"Successfully deleted {count} strategy results from {Config.RESULT_STORE} result store.")
             return count
     except Exception as e:
         print(f"Error clearing strategy data: {str(e)}")
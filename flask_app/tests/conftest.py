@@ -0,0 +1,51 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# The app imports its modules relative to flask_app/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def _make_bars(lengths: dict, start: str = '2024-01-01', seed: int = 0) -> pd.DataFrame:
+    """Random-walk daily bars for each ts_code, in the canonical column layout."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for ts_code, n in lengths.items():
+        close = 10 + np.cumsum(rng.normal(0, 0.2, n))
+        frames.append(pd.DataFrame({
+            'ts_code': ts_code,
+            'date': pd.bdate_range(start, periods=n),
+            'open': close + rng.normal(0, 0.1, n),
+            'high': close + 0.5,
+            'low': close - 0.5,
+            'close': close,
+            'vol': rng.uniform(1e5, 1e6, n),
+            'amount': rng.uniform(1e6, 1e7, n)
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def make_bars():
+    """Factory of synthetic market data: make_bars({'A.SH': 40, ...})."""
+    return _make_bars
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Flask app with the models created in a throwaway SQLite database."""
+    from flask import Flask
+    from config import Config
+    from models import db, configure_engines
+
+    app = Flask('test')
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    configure_engines(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,59 @@
+import pytest
+from data_loader.dataset_manager import DatasetManager
+
+
+@pytest.fixture(scope='module')
+def web_app(tmp_path_factory):
+    """The web app on a throwaway database, with logins disabled."""
+    from config import Config
+    tmp_path = tmp_path_factory.mktemp('web_app')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'site.db'}")
+        import app as app_module
+    app_module.dataset_manager.stop()
+    app_module.app.config['LOGIN_DISABLED'] = True
+    return app_module
+
+
+@pytest.fixture
+def client(web_app, make_bars, tmp_path, monkeypatch):
+    file_path = tmp_path / 'merged_data.parquet'
+    make_bars({'A.SH': 120, 'B.SH': 80}).to_parquet(file_path)
+    manager = DatasetManager(str(file_path), poll_interval=3600)
+    monkeypatch.setattr(web_app, 'dataset_manager', manager)
+    client = web_app.app.test_client()
+    client.file_path = file_path
+    return client
+
+
+def test_stock_data_revalidates_with_etag(client):
+    response = client.get('/stock_data?ts_code=A.SH')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.json['main']
+
+    revalidated = client.get('/stock_data?ts_code=A.SH', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert revalidated.data == b''
+
+    # A stale ETag gets the full response
+    assert client.get('/stock_data?ts_code=A.SH', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_etag_depends_on_stock_view_and_version(client, web_app, make_bars):
+    etag = client.get('/stock_data?ts_code=A.SH').headers['ETag']
+    assert client.get('/stock_data?ts_code=B.SH').headers['ETag'] != etag
+    assert client.get('/stock_data?ts_code=A.SH&last_n=20').headers['ETag'] != etag
+
+    make_bars({'A.SH': 121}).to_parquet(client.file_path)
+    assert web_app.dataset_manager.reload()
+    response = client.get('/stock_data?ts_code=A.SH', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_stock_data_errors(client):
+    assert client.get('/stock_data').status_code == 400
+    assert client.get('/stock_data?ts_code=X.SH').status_code == 404
+    assert client.get('/stock_data?ts_code=A.SH&last_n=abc').status_code == 400
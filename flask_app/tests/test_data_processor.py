@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from data_loader.data_loader import StockDataset
+from data_loader.data_processor import process_strategy_data, resolve_window
+from strategies.StrategyManager import StrategyManager
+
+# A window calculation starts at the window minus the strategy's warm-up (get_lookback). EMAs leave
+# a weight of ~e**-20 to the bars before that (see EMA_WARMUP_SPANS), hence the tolerance.
+RTOL = ATOL = 1e-9
+
+
+@pytest.fixture
+def stock(make_bars):
+    # Longer than the MACD warm-up, so late windows really start after the first bar
+    dataset = StockDataset(make_bars({'A.SH': 600}))
+    return dataset.get('A.SH'), dataset.get_input('A.SH')
+
+
+def self_based_configs():
+    return [
+        {'name': name, 'params': {}} for name in StrategyManager.available_strategies()
+        if StrategyManager.get_strategy(name).is_self_based()
+    ]
+
+
+@pytest.mark.parametrize('window', [(450, 600), (200, 320), (0, 50), (599, 600)])
+def test_window_matches_full_history(app, stock, window):
+    df, strategy_input = stock
+    configs = self_based_configs()
+    lo, hi = window
+
+    full = process_strategy_data(df, configs, strategy_input)
+    windowed = process_strategy_data(df, configs, strategy_input, window=window)
+
+    assert windowed.keys() == full.keys()
+    for name, result in windowed.items():
+        assert 'error' not in result, result
+        assert result['data'].keys() == full[name]['data'].keys()
+        for output, values in result['data'].items():
+            np.testing.assert_allclose(
+                values, full[name]['data'][output][lo:hi], rtol=RTOL, atol=ATOL, equal_nan=True,
+                err_msg=f"{name}.{output}"
+            )
+
+
+def test_resolve_window(stock):
+    df, _ = stock
+    dates = df['date']
+    assert resolve_window(dates) == (0, 600)
+    assert resolve_window(dates, last_n=10) == (590, 600)
+    lo, hi = resolve_window(dates, start=dates.iloc[100], end=dates.iloc[199])
+    assert (lo, hi) == (100, 200)
+    assert resolve_window(dates, start=dates.iloc[100], end=dates.iloc[199], last_n=5) == (195, 200)
+    with pytest.raises(ValueError):
+        resolve_window(dates, last_n=-1)
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_loader.data_loader import NUMERICAL_COLUMNS, StockDataset
+from strategies.StrategyManager import StrategyManager
+
+HISTORY = 150  # Longer than every strategy's default window, so update has no warm-up left
+NEW_BARS = 30
+
+INCREMENTAL = sorted(strategy.name() for strategy in StrategyManager.incremental_strategies())
+
+
+def test_incremental_strategies_exist():
+    assert INCREMENTAL
+
+
+@pytest.mark.parametrize('name', INCREMENTAL)
+def test_update_matches_calculate(make_bars, name):
+    strategy = StrategyManager.get_strategy(name)
+    params = strategy.get_input_parameters()
+    bars = make_bars({'A.SH': HISTORY + NEW_BARS})
+    data = bars[NUMERICAL_COLUMNS].astype(float)
+
+    state = strategy.init_state(data.iloc[:HISTORY], **params)
+    updates = [strategy.update(state, bar) for bar in data.iloc[HISTORY:].to_dict('records')]
+    expected = strategy.calculate(data, **params).iloc[HISTORY:]
+
+    for output in expected.columns:
+        values = np.array([update[output] for update in updates], dtype=float)
+        np.testing.assert_allclose(values, expected[output].to_numpy(dtype=float), rtol=1e-9, equal_nan=True)
+
+
+def test_update_states_matches_calculate(make_bars):
+    bars = make_bars({'A.SH': HISTORY + NEW_BARS, 'B.SH': HISTORY + NEW_BARS}, seed=1)
+    history = bars.groupby('ts_code').head(HISTORY)
+    new_bars = bars.groupby('ts_code').tail(NEW_BARS)
+
+    states = StrategyManager.init_states(StockDataset(history))
+    # A new listing has no state yet and starts from an empty history
+    outputs = StrategyManager.update_states(states, new_bars.assign(ts_code=new_bars['ts_code'].replace('B.SH', 'C.SH')))
+    assert set(outputs) == {'A.SH', 'C.SH'}
+
+    full = bars[bars['ts_code'] == 'A.SH'][NUMERICAL_COLUMNS].astype(float).reset_index(drop=True)
+    for name, strategy_outputs in outputs['A.SH'].items():
+        strategy = StrategyManager.get_strategy(name)
+        expected = strategy.calculate(full, **strategy.get_input_parameters()).iloc[HISTORY:]
+        for output, values in strategy_outputs.items():
+            np.testing.assert_allclose(values, expected[output].to_numpy(dtype=float), rtol=1e-9, equal_nan=True)
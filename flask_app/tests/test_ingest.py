@@ -0,0 +1,89 @@
+import os
+import pandas as pd
+import pytest
+from data_loader.data_loader import NUMERICAL_COLUMNS, load_parquet, market_data_files, resolve_market_data_path
+from data_loader.ingest import compact_store, ingest_delta, read_manifest, seed_store
+
+COLUMNS = ['ts_code', 'date'] + NUMERICAL_COLUMNS
+
+
+@pytest.fixture
+def market(make_bars, tmp_path):
+    """History in merged_data.parquet, and the bars of the following days (overlapping its last day)."""
+    bars = make_bars({'A.SH': 70, 'B.SH': 70})
+    history = bars.groupby('ts_code').head(60)
+    delta = bars.groupby('ts_code').tail(11)
+    parquet_path = str(tmp_path / 'merged_data.parquet')
+    history.to_parquet(parquet_path)
+    return parquet_path, str(tmp_path / 'merged_data'), bars, delta
+
+
+def load_store(store_dir, **kwargs):
+    df = load_parquet(store_dir, **kwargs)
+    return df.assign(ts_code=df['ts_code'].astype(str)).sort_values(['ts_code', 'date']).reset_index(drop=True)
+
+
+def expected_bars(bars):
+    return bars[COLUMNS].sort_values(['ts_code', 'date']).reset_index(drop=True)
+
+
+def test_reingesting_a_delta_is_a_noop(market):
+    parquet_path, store_dir, bars, delta = market
+    assert resolve_market_data_path(parquet_path) == parquet_path
+
+    # The first ingest seeds the store from the history; the overlapping day is skipped
+    assert ingest_delta(delta, store_dir) == 20
+    assert resolve_market_data_path(parquet_path) == store_dir
+    manifest, files = read_manifest(store_dir), sorted(os.listdir(store_dir))
+
+    assert ingest_delta(delta, store_dir) == 0
+    assert read_manifest(store_dir) == manifest
+    assert sorted(os.listdir(store_dir)) == files
+    pd.testing.assert_frame_equal(load_store(store_dir), expected_bars(bars), check_dtype=False)
+
+
+def test_store_holds_canonical_types(market):
+    parquet_path, store_dir, bars, _ = market
+    assert seed_store(store_dir) == 120
+    assert seed_store(store_dir) == 0
+
+    df = load_parquet(store_dir)
+    assert isinstance(df['ts_code'].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert all(df[column].dtype == 'float64' for column in NUMERICAL_COLUMNS)
+    assert read_manifest(store_dir)['last_date'] == {'A.SH': '20240322', 'B.SH': '20240322'}
+
+
+def test_compaction_keeps_the_data(market):
+    _, store_dir, bars, delta = market
+    # Ten daily parts after the seed: five in March and five in April
+    for _, day in delta.groupby('date'):
+        ingest_delta(day, store_dir)
+    assert len(read_manifest(store_dir)['parts']) == 11
+
+    assert compact_store(store_dir, period='month', min_parts=2) == 10
+    manifest = read_manifest(store_dir)
+    assert [(part['min_date'], part['max_date']) for part in manifest['parts']] == [
+        ('20240101', '20240322'), ('20240325', '20240329'), ('20240401', '20240405')
+    ]
+    pd.testing.assert_frame_equal(load_store(store_dir), expected_bars(bars), check_dtype=False)
+
+    # Readers only see the listed parts; the replaced ones are removed by the next ingest or compaction
+    assert len(market_data_files(store_dir)) == len(manifest['parts'])
+    compact_store(store_dir)
+    assert len([name for name in os.listdir(store_dir) if name.endswith('.parquet')]) == len(manifest['parts'])
+
+
+@pytest.mark.parametrize('start, end', [('2024-03-01', None), (None, '20240215'), ('2024-02-01', '2024-03-10')])
+def test_date_filter_on_the_store(market, start, end):
+    _, store_dir, bars, delta = market
+    ingest_delta(delta, store_dir)
+
+    expected = expected_bars(bars)
+    if start is not None:
+        expected = expected[expected['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        expected = expected[expected['date'] <= pd.Timestamp(end)]
+    df = load_store(store_dir, start_date=start, end_date=end)
+    assert len(df) > 0
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True), check_dtype=False)
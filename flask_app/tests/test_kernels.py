@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from strategies.Kernels import rolling_argmax, rolling_argmin
+
+
+def reference_arg(series: pd.Series, window: int, find_max: bool) -> pd.Series:
+    """The rolling.apply(idxmax/idxmin) the kernels replace."""
+    arg = (lambda x: x.idxmax()) if find_max else (lambda x: x.idxmin())
+    return series.rolling(window).apply(arg, raw=False)
+
+
+@pytest.mark.parametrize('window', [1, 2, 3, 7, 20])
+@pytest.mark.parametrize('kernel, find_max', [(rolling_argmax, True), (rolling_argmin, False)])
+def test_rolling_arg_matches_rolling_apply(kernel, find_max, window):
+    rng = np.random.default_rng(window)
+    # Few distinct values, so most windows contain ties; ties resolve to the first occurrence
+    values = rng.integers(0, 4, 200).astype(float)
+    values[[5, 6, 50, 120]] = np.nan
+    series = pd.Series(values)
+
+    pd.testing.assert_series_equal(kernel(series, window), reference_arg(series, window, find_max))
+
+
+def test_rolling_arg_shorter_than_window():
+    assert rolling_argmax(pd.Series([1.0, 2.0]), 3).isna().all()
+
+
+@pytest.mark.parametrize('kernel, find_max', [(rolling_argmax, True), (rolling_argmin, False)])
+def test_rolling_arg_by_group_matches_per_group(kernel, find_max):
+    rng = np.random.default_rng(1)
+    groups = np.repeat(['A', 'B', 'C'], [30, 4, 25])
+    series = pd.Series(rng.integers(0, 5, len(groups)).astype(float))
+    window = 5
+
+    grouped = kernel(series, window, by=groups)
+    for group in ['A', 'B', 'C']:
+        rows = np.flatnonzero(groups == group)
+        expected = reference_arg(series.iloc[rows].reset_index(drop=True), window, find_max) + rows[0]
+        np.testing.assert_array_equal(grouped.iloc[rows].to_numpy(), expected.to_numpy())
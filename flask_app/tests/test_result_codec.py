@@ -0,0 +1,54 @@
+import zlib
+import numpy as np
+import pytest
+from data_loader.result_codec import build_result_data, decode_series, encode_series, get_config_hash
+
+
+def test_round_trip_is_exact():
+    rng = np.random.default_rng(0)
+    floats = rng.normal(0, 1e3, 500)
+    floats[[0, 1, 250]] = np.nan
+    data = {
+        'close_ma_5': floats,
+        'signal': np.arange(-50, 50, dtype='int64'),
+        'flags': np.array([True, False, True]),
+        'empty': np.array([], dtype='float64'),
+    }
+
+    decoded = decode_series(encode_series(data))
+
+    assert list(decoded) == list(data)
+    for name, values in data.items():
+        assert decoded[name].dtype == values.dtype
+        np.testing.assert_array_equal(decoded[name], values)
+
+
+def test_lists_with_none_decode_as_nan():
+    decoded = decode_series(encode_series({'rsi': [None, None, 1.5, 2.25], 'count': [1, 2, 3]}))
+    np.testing.assert_array_equal(decoded['rsi'], [np.nan, np.nan, 1.5, 2.25])
+    np.testing.assert_array_equal(decoded['count'], [1, 2, 3])
+
+
+def test_float32_storage_is_lossy_but_close():
+    values = np.random.default_rng(1).normal(10, 1, 100)
+    blob = encode_series({'close': values}, float_dtype='float32')
+
+    decoded = decode_series(blob)['close']
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, values, rtol=1e-6)
+    assert len(blob) < len(encode_series({'close': values}))
+
+
+def test_unknown_codec_raises():
+    with pytest.raises(ValueError, match='Unknown strategy result codec'):
+        decode_series(b'x' + zlib.compress(b''))
+
+
+def test_build_result_data():
+    config = {'type': 'line', 'name': 'MA'}
+    series = decode_series(encode_series({'ma': [1.0, None, 3.0]}))
+
+    result = build_result_data(series, config)
+    assert result['config'] == config
+    assert result['data']['ma'][0] == 1.0 and np.isnan(result['data']['ma'][1])
+    assert get_config_hash(config) == get_config_hash(dict(reversed(list(config.items()))))
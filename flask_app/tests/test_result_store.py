@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import pytest
+from data_loader.result_store import ParquetResultStore, SqlResultStore
+from models import StrategyResult, StrategyConfig
+
+
+def make_row(ts_code, strategy_name='ma', params_hash='h1', values=(1.0, 2.0, 3.0)):
+    return {
+        'dates': [f"2024010{i + 1}" for i in range(len(values))],
+        'ts_code': ts_code,
+        'strategy_name': strategy_name,
+        'params_hash': params_hash,
+        'result_data': {'data': {'ma_5': list(values)}, 'config': {'type': 'line', 'name': strategy_name}}
+    }
+
+
+@pytest.fixture
+def store(app):
+    return SqlResultStore()
+
+
+def test_second_upsert_replaces_the_result(store):
+    assert store.save([make_row('A.SH'), make_row('B.SH')]) == 2
+    assert store.save([make_row('A.SH', values=(4.0, 5.0))], batch_size=1) == 1
+
+    assert StrategyResult.query.count() == 2
+    # Identical configs are stored once
+    assert StrategyConfig.query.count() == 1
+    np.testing.assert_allclose(store.get('A.SH', 'ma', 'h1')['data']['ma_5'], [4.0, 5.0])
+    np.testing.assert_allclose(store.get('B.SH', 'ma', 'h1')['data']['ma_5'], [1.0, 2.0, 3.0])
+
+
+def test_save_error_returns_zero(store):
+    assert store.save([make_row('A.SH'), {'ts_code': 'B.SH'}]) == 0
+    # The batch is rolled back as a whole and the session stays usable
+    assert StrategyResult.query.count() == 0
+    assert store.save([make_row('A.SH')]) == 1
+
+
+def test_get_missing_reports_stale_params(store):
+    store.save([make_row('A.SH', params_hash='old'), make_row('B.SH', params_hash='new'), make_row('A.SH', 'rsi', 'r1')])
+
+    missing = store.get_missing(['A.SH', 'B.SH', 'C.SH'], [('ma', 'new'), ('rsi', 'r1')])
+    # A.SH only has a result for the old ma params; C.SH has none
+    assert sorted(missing) == [('A.SH', 'ma'), ('B.SH', 'rsi'), ('C.SH', 'ma'), ('C.SH', 'rsi')]
+    assert store.get_missing(['B.SH'], [('ma', 'new')]) == []
+    assert store.get_missing([], [('ma', 'new')]) == []
+
+
+def test_parquet_store_newest_copy_wins_and_compacts(tmp_path):
+    store = ParquetResultStore(str(tmp_path / 'results'))
+    store.save([make_row('A.SH'), make_row('B.SH')])
+    store.save([make_row('A.SH', values=(4.0, 5.0))])
+    directory = store.partition_dir('ma', 'h1')
+    assert len([name for name in os.listdir(directory) if name.startswith('part-')]) == 2
+    assert store.get('A.SH', 'ma', 'h1')['data']['ma_5'] == [4.0, 5.0]
+
+    assert store.compact() == 1
+    assert len([name for name in os.listdir(directory) if name.startswith('part-')]) == 1
+    assert store.get('A.SH', 'ma', 'h1')['data']['ma_5'] == [4.0, 5.0]
+    assert store.get('B.SH', 'ma', 'h1') == {'data': {'ma_5': [1.0, 2.0, 3.0]}, 'config': {'type': 'line', 'name': 'ma'}}
+    assert store.get_missing(['A.SH', 'C.SH'], [('ma', 'h1')]) == [('C.SH', 'ma')]
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+from data_loader.data_loader import NUMERICAL_COLUMNS
+from strategies.EvaluationContext import EvaluationContext
+from strategies.StrategyManager import StrategyManager, get_params_hash
+
+GRIDS = {
+    'ma': [{'periods': [5, 10, 20]}, {'periods': [3, 60]}, {}, {'periods': [5, 10, 20]}],
+    'rsi': [{'period': 6}, {'period': 14}, {'period': 24}],
+    'macd': [{}, {'fast_period': 5, 'slow_period': 35, 'signal_period': 5}],
+}
+
+
+@pytest.mark.parametrize('name', sorted(GRIDS))
+def test_calculate_grid_matches_calculate(make_bars, name):
+    data = make_bars({'A.SH': 120})[NUMERICAL_COLUMNS].astype(float)
+    strategy = StrategyManager.get_strategy(name)
+    param_sets = GRIDS[name]
+
+    results = StrategyManager.calculate_grid(name, data, param_sets, context=EvaluationContext(data))
+
+    expected = {}
+    for params in param_sets:
+        adjusted = StrategyManager.adjust_params(strategy, params)
+        expected[get_params_hash(adjusted)] = strategy.calculate(data, **adjusted)
+    # Identical parameter sets are calculated once
+    assert results.keys() == expected.keys()
+    for params_hash, result in results.items():
+        pd.testing.assert_frame_equal(result, expected[params_hash], rtol=1e-12)
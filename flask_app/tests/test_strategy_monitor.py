@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from data_loader.data_loader import StockDataset, save_columns_npy
+from strategies.StrategyManager import StrategyManager
+import strategy_monitor
+
+def make_dataset(lengths: dict) -> StockDataset:
+    rng = np.random.default_rng(0)
+    frames = []
+    for ts_code, n in lengths.items():
+        close = 10 + np.cumsum(rng.normal(0, 0.2, n))
+        frames.append(pd.DataFrame({
+            'ts_code': ts_code,
+            'date': pd.date_range('2024-01-01', periods=n, freq='D'),
+            'open': close + rng.normal(0, 0.1, n),
+            'high': close + 0.5,
+            'low': close - 0.5,
+            'close': close,
+            'vol': rng.uniform(1e5, 1e6, n),
+            'amount': rng.uniform(1e6, 1e7, n)
+        }))
+    return StockDataset(pd.concat(frames, ignore_index=True))
+
+def test_process_shard_with_non_adjacent_tickers(tmp_path):
+    # B sits between A and C in row order but is already computed, so the shard holds only A and C
+    dataset = make_dataset({'A.SH': 40, 'B.SH': 25, 'C.SH': 30})
+    manager = StrategyManager()
+    panel_names = {
+        name for name in manager.available_strategies()
+        if manager.get_strategy(name).is_self_based() and manager.get_strategy(name).supports_panel()
+    }
+    assert panel_names
+
+    column_paths = save_columns_npy(dataset.numeric, str(tmp_path))
+    shard = [(ts, *dataset.get_offsets(ts), panel_names) for ts in ['A.SH', 'C.SH']]
+    rows = strategy_monitor.process_shard(column_paths, shard)
+
+    assert {(row['ts_code'], row['strategy_name']) for row in rows} == {
+        (ts, name) for ts in ['A.SH', 'C.SH'] for name in panel_names
+    }
+    for row in rows:
+        strategy = manager.get_strategy(row['strategy_name'])
+        stock = dataset.get_input(row['ts_code'])
+        expected = strategy_monitor.process_stock_data(stock, strategy, strategy.get_input_parameters())
+        for output, values in expected['data'].items():
+            np.testing.assert_allclose(row['result_data']['data'][output], values, rtol=1e-9, equal_nan=True)